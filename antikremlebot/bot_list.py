@@ -1,14 +1,19 @@
 import asyncio
+import logging
+import pickle
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
 from os.path import isfile
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession
 
 from settings import Settings
 
+# Строка списка ботов: "<id канала>=<дата регистрации>"
+_BOT_PATTERN = re.compile(r"(?P<id>UC.+)=(?P<date>\d\d\d\d-\d\d-\d\d)")
+
 
 @dataclass
 class Bot:
@@ -16,35 +21,116 @@ class Bot:
     registration_date: date
 
 
+@dataclass
+class BotList:
+    """
+    Разобранный список ботов вместе с заголовками ответа, по которым его можно перепроверить
+    """
+
+    bots: List[Bot]
+    etag: str = ""
+    last_modified: str = ""
+    ids: FrozenSet[str] = field(init=False)
+
+    def __post_init__(self):
+        self.ids = frozenset(bot.user for bot in self.bots)
+
+
+def parse_bot_list(text: str) -> List[Bot]:
+    """
+    Разобрать текст списка ботов
+    """
+    return [
+        Bot(match.group("id"), date.fromisoformat(match.group("date")))
+        for match in _BOT_PATTERN.finditer(text)
+    ]
+
+
 class AntiIraApi:
-    def __init__(self, session: ClientSession):
+    def __init__(self, session: ClientSession, cache_path: Optional[str] = None):
         """
         Класс реализует общение с сервисами команды по поиску ботов
         Тут же общение с конфигами которые могут лежать локально на ПК
         :param session: Текущия сессия
+        :param cache_path: файл, в котором хранятся уже разобранные списки ботов. Если указан, списки
+                           перекачиваются, только если изменились (по ETag/Last-Modified), а без сети
+                           используются последние скачанные
         """
         self._session = session
+        self._cache_path = cache_path
+        self._lists: Dict[str, BotList] = {}
+        if cache_path and isfile(cache_path):
+            try:
+                with open(cache_path, "rb") as file:
+                    self._lists = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                logging.warning("Bot list cache " + cache_path + " is broken, ignoring")
+
+    def _save_cache(self):
+        if not self._cache_path:
+            return
+        with open(self._cache_path, "wb") as file:
+            pickle.dump(self._lists, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    async def _request(self, link: str) -> BotList:
+        """
+        Скачать список ботов, если он изменился с прошлого раза
+        :param link: ссылка на список
+        :return: разобранный список
+        """
+        cached = self._lists.get(link)
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        try:
+            async with self._session.get(link, headers=headers) as resp:
+                if resp.status == 304 and cached:
+                    return cached
+                resp.raise_for_status()
+                bot_list = BotList(
+                    parse_bot_list(await resp.text()),
+                    resp.headers.get("ETag", ""),
+                    resp.headers.get("Last-Modified", ""),
+                )
+        except (ClientError, asyncio.TimeoutError):
+            if not cached:
+                raise
+            logging.warning("Can't fetch " + link + ", using cached bot list")
+            return cached
+        self._lists[link] = bot_list
+        return bot_list
+
+    async def _get_lists(self, categories: Optional[List[str]]) -> List[BotList]:
+        if categories is not None:
+            links = [Settings.bot_list_links()[c] for c in categories]
+        else:  # Боты всех категорий по-умолчанию
+            links = Settings.bot_list_links().values()
 
-    async def _request(self, link: str) -> str:
-        async with self._session.get(link) as resp:
-            return await resp.text()
+        lists = await asyncio.gather(*[self._request(link) for link in links])
+        self._save_cache()
+        return lists
 
     async def get_bot_list(self, categories: Optional[List[str]] = None) -> List[Bot]:
         """
         Получить список известных youtube кремлеботов
         :return: Список ботов
         """
-        if categories is not None:
-            links = [Settings.bot_list_links()[c] for c in categories]
-        else:  # Боты всех категорий по-умолчанию
-            links = Settings.bot_list_links().values()
+        lists = await self._get_lists(categories)
+        return [bot for bot_list in lists for bot in bot_list.bots]
 
-        texts = await asyncio.gather(*[self._request(link) for link in links])
-        text = "\n".join(texts)
-        return [
-            Bot(r[0], date.fromisoformat(r[1]))
-            for r in re.findall(r"(?P<id>UC.+)=(?P<date>\d\d\d\d-\d\d-\d\d)", text)
-        ]
+    async def get_bot_ids(
+        self, categories: Optional[List[str]] = None
+    ) -> FrozenSet[str]:
+        """
+        Получить идентификаторы известных youtube кремлеботов
+        :return: Множество идентификаторов каналов ботов
+        """
+        lists = await self._get_lists(categories)
+        if len(lists) == 1:
+            return lists[0].ids
+        return frozenset().union(*[bot_list.ids for bot_list in lists])
 
     @classmethod
     def _read_file_list(cls, path: str) -> List[str]:
@@ -0,0 +1,3 @@
+from .fake_api import FakeConfig, FakeYouTube, make_app
+
+__all__ = ["FakeConfig", "FakeYouTube", "make_app"]
@@ -0,0 +1,159 @@
+"""
+Тест производительности загрузки комментариев без расхода настоящей квоты:
+    python -m benchmark --channels 20 --videos 10 --threads 200 --replies 20 --latency 0.05 --errors 0.01
+Поднимает локальную замену YouTube API (см. fake_api.py) и прогоняет через неё тот же конвейер, что и main.py:
+видео каналов, комментарии под ними и статистика. В конце печатает скорость, число запросов, квоту и пиковую память
+"""
+import argparse
+import asyncio
+import json
+import time
+from itertools import chain
+from statistics import CompactStatistics
+
+from aiohttp import ClientSession, web
+
+from youtube import AdaptiveLimiter, KeyPool, QuotaScheduler, YouTubeApi
+
+from .fake_api import FakeConfig, FakeYouTube, make_app
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """
+    Пиковый объём занятой процессом памяти в мегабайтах (0, если платформа не позволяет его узнать)
+    """
+    if resource is None:
+        return 0.0
+    # В Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def crawl(api: YouTubeApi, channels, uploads: bool, stat: CompactStatistics):
+    """
+    Скачать видео каналов и комментарии под ними, как это делает main.main
+    :return: количество комментариев
+    """
+    if uploads:
+        playlists = await api.list_uploads_playlists(channels)
+        groups = await asyncio.gather(
+            *[
+                api.list_videos_by_uploads(channel, playlists[channel])
+                for channel in channels
+            ]
+        )
+    else:
+        groups = await asyncio.gather(
+            *[api.list_videos_by_channel(channel) for channel in channels]
+        )
+    videos = list(chain(*groups))
+
+    async def stream(video) -> int:
+        count = 0
+        async for comment in api.list_comments(video.code, video.channel):
+            stat.add(comment)
+            count += 1
+        return count
+
+    return sum(await asyncio.gather(*[stream(video) for video in videos]))
+
+
+async def run(
+    config: FakeConfig, uploads: bool, reply_parallel: int, with_text: bool = True
+) -> dict:
+    fake = FakeYouTube(config)
+    runner = web.AppRunner(make_app(fake), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+
+    limiter = AdaptiveLimiter()
+    scheduler = QuotaScheduler(10 ** 9, limiter=limiter)
+    stat = CompactStatistics()
+    try:
+        async with ClientSession() as session:
+            api = YouTubeApi(
+                KeyPool(["benchmark"], budget=10 ** 9),
+                session,
+                scheduler=scheduler,
+                limiter=limiter,
+                reply_parallel=reply_parallel,
+                with_text=with_text,
+                api_url="http://" + host + ":" + str(port) + "/youtube/v3/",
+            )
+            start = time.perf_counter()
+            comments = await crawl(api, fake.channel_ids, uploads, stat)
+            elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+    return {
+        "comments": comments,
+        "seconds": round(elapsed, 3),
+        "comments_per_second": round(comments / elapsed, 1) if elapsed else 0,
+        "requests": sum(fake.requests.values()),
+        "requests_by_endpoint": fake.requests,
+        "response_bytes": fake.bytes,
+        "injected_errors": fake.errors,
+        "retries": limiter.retries,
+        "concurrency_limit": limiter.limit,
+        "quota": scheduler.spent,
+        "quota_by_endpoint": scheduler.stat,
+        "statistics_rows": len(stat),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    defaults = FakeConfig()
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    parser.add_argument("--channels", type=int, default=defaults.channels)
+    parser.add_argument("--videos", type=int, default=defaults.videos)
+    parser.add_argument("--threads", type=int, default=defaults.threads)
+    parser.add_argument("--replies", type=int, default=defaults.replies)
+    parser.add_argument("--authors", type=int, default=defaults.authors)
+    parser.add_argument(
+        "--latency", type=float, default=defaults.latency, help="задержка ответа, с"
+    )
+    parser.add_argument(
+        "--errors", type=float, default=defaults.errors, help="доля ответов с ошибкой"
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument(
+        "--uploads", action="store_true", help="искать видео через плейлисты загрузок"
+    )
+    parser.add_argument("--reply-parallel", type=int, default=10)
+    parser.add_argument(
+        "--no-text", action="store_true", help="не скачивать тексты комментариев"
+    )
+    parser.add_argument("--json", help="сохранить результат в JSON файл")
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        channels=args.channels,
+        videos=args.videos,
+        threads=args.threads,
+        replies=args.replies,
+        authors=args.authors,
+        latency=args.latency,
+        errors=args.errors,
+        seed=args.seed,
+    )
+    result = asyncio.run(
+        run(config, args.uploads, args.reply_parallel, not args.no_text)
+    )
+
+    for name, value in result.items():
+        print(name + ": " + str(value))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
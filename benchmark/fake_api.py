@@ -0,0 +1,249 @@
+"""
+Локальная замена YouTube API для тестов производительности.
+Отвечает на запросы search, videos, channels, playlistItems, commentThreads и comments синтетическими, но
+детерминированными данными: одни и те же параметры всегда дают одни и те же каналы, видео и комментарии.
+Можно задать задержку ответа и долю ответов с ошибкой, чтобы проверить повторы и адаптивный лимит.
+Параметр fields (partial response) поддерживается, как в настоящем API
+"""
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+from youtube.quota import QUOTA_COSTS
+
+# Максимальный размер страницы, который отдаёт настоящий API
+MAX_PAGE_SIZE = 100
+# Сколько ответов приходит вместе с веткой комментариев (остальные нужно загружать через comments)
+INLINE_REPLIES = 5
+
+_EPOCH = datetime(2021, 1, 1)
+
+
+def _date(minutes: int) -> str:
+    return (_EPOCH + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_fields(fields: str) -> Dict:
+    """
+    Разобрать параметр fields: "a,b(c,d)" -> {"a": {}, "b": {"c": {}, "d": {}}} (пустой словарь - поле целиком)
+    """
+    root: Dict = {}
+    stack = [root]
+    name = ""
+    last = root
+    for char in fields:
+        if char not in ",()":
+            name += char
+            continue
+        if name.strip():
+            last = stack[-1].setdefault(name.strip(), {})
+        name = ""
+        if char == "(":
+            stack.append(last)
+        elif char == ")":
+            stack.pop()
+    if name.strip():
+        stack[-1].setdefault(name.strip(), {})
+    return root
+
+
+def select_fields(data: Any, fields: Dict) -> Any:
+    """
+    Оставить в ответе только выбранные поля (см. parse_fields)
+    """
+    if not fields:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, fields) for item in data]
+    return {
+        name: select_fields(data[name], subfields)
+        for name, subfields in fields.items()
+        if name in data
+    }
+
+
+@dataclass
+class FakeConfig:
+    channels: int = 10  # Количество каналов
+    videos: int = 10  # Видео на каждом канале
+    threads: int = 100  # Веток комментариев под каждым видео
+    replies: int = 10  # Ответов в каждой ветке
+    authors: int = 1000  # Количество разных авторов комментариев
+    latency: float = 0.0  # Задержка ответа в секундах
+    errors: float = 0.0  # Доля ответов с ошибкой 503
+    seed: int = 0  # Начальное значение генератора ошибок
+
+
+class FakeYouTube:
+    def __init__(self, config: FakeConfig):
+        """
+        Синтетический YouTube
+        :param config: размеры данных, задержка и ошибки
+        """
+        self.config = config
+        self._random = random.Random(config.seed)
+        self.requests: Dict[str, int] = {}  # Метод API -> количество запросов
+        self.errors = 0  # Сколько ответов с ошибкой отдано
+        self.quota = 0  # Сколько единиц квоты потрачено бы на настоящем API
+        self.bytes = 0  # Объём отданных ответов
+
+    @property
+    def channel_ids(self) -> List[str]:
+        return ["UCfake%06d" % channel for channel in range(self.config.channels)]
+
+    def _videos(self, channel: str) -> List[str]:
+        return [channel[6:] + "v%04d" % video for video in range(self.config.videos)]
+
+    @classmethod
+    def _channel_of_video(cls, video: str) -> str:
+        return "UCfake" + video.split("v")[0]
+
+    def _author(self, *numbers: int) -> str:
+        return "UCuser%06d" % (hash(numbers) % self.config.authors)
+
+    def _comment(self, id: str, author: str, minutes: int) -> Dict:
+        return {
+            "kind": "youtube#comment",
+            "id": id,
+            "snippet": {
+                "authorChannelId": {"value": author},
+                "textOriginal": "Synthetic comment " + id,
+                "publishedAt": _date(minutes),
+            },
+        }
+
+    def _replies(self, thread: str) -> List[Dict]:
+        number = int(thread.rsplit("t", 1)[1])
+        return [
+            self._comment(
+                thread + "r%d" % reply,
+                self._author(number, reply),
+                self.config.threads + reply,
+            )
+            for reply in range(self.config.replies)
+        ]
+
+    def _thread(self, video: str, number: int) -> Dict:
+        id = video + "t%d" % number
+        return {
+            "kind": "youtube#commentThread",
+            "id": id,
+            "snippet": {
+                "totalReplyCount": self.config.replies,
+                # Ветки отдаются от новых к старым, как при order=time
+                "topLevelComment": self._comment(
+                    id, self._author(number), self.config.threads - number
+                ),
+            },
+            "replies": {"comments": self._replies(id)[:INLINE_REPLIES]},
+        }
+
+    @classmethod
+    def _page(cls, items: List, params, page_size: int = MAX_PAGE_SIZE) -> Dict:
+        size = min(int(params.get("maxResults", 5)), page_size)
+        start = int(params.get("pageToken", 0))
+        data = {"items": items[start : start + size]}
+        if start + size < len(items):
+            data["nextPageToken"] = str(start + size)
+        return data
+
+    def search(self, params) -> Dict:
+        items = [
+            {"id": {"kind": "youtube#video", "videoId": video}}
+            for video in self._videos(params["channelId"])
+        ]
+        return self._page(items, params, 50)
+
+    def videos(self, params) -> Dict:
+        return {
+            "items": [
+                {
+                    "kind": "youtube#video",
+                    "id": video,
+                    "snippet": {"channelId": self._channel_of_video(video)},
+                }
+                for video in params["id"].split(",")
+            ]
+        }
+
+    def channels(self, params) -> Dict:
+        return {
+            "items": [
+                {
+                    "id": channel,
+                    "snippet": {"title": channel, "publishedAt": _date(0)},
+                    "statistics": {
+                        "videoCount": str(self.config.videos),
+                        "viewCount": "0",
+                        "subscriberCount": "0",
+                    },
+                    "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel}},
+                }
+                for channel in params["id"].split(",")
+            ]
+        }
+
+    def playlistItems(self, params) -> Dict:
+        channel = params["playlistId"][2:]
+        items = [
+            {"contentDetails": {"videoId": video, "videoPublishedAt": _date(-number)}}
+            for number, video in enumerate(self._videos(channel))
+        ]
+        return self._page(items, params, 50)
+
+    def commentThreads(self, params) -> Dict:
+        video = params["videoId"]
+        start = int(params.get("pageToken", 0))
+        size = min(int(params.get("maxResults", 20)), MAX_PAGE_SIZE)
+        # Ветки создаются только для запрошенной страницы
+        end = min(start + size, self.config.threads)
+        data = {"items": [self._thread(video, number) for number in range(start, end)]}
+        if end < self.config.threads:
+            data["nextPageToken"] = str(end)
+        return data
+
+    def comments(self, params) -> Dict:
+        return self._page(self._replies(params["parentId"]), params)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        handler = getattr(self, endpoint, None)
+        if endpoint not in QUOTA_COSTS or handler is None:
+            raise web.HTTPNotFound()
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        if self.config.errors and self._random.random() < self.config.errors:
+            self.errors += 1
+            return web.json_response(
+                {
+                    "error": {
+                        "code": 503,
+                        "message": "The service is currently unavailable.",
+                        "errors": [{"reason": "backendError"}],
+                    }
+                },
+                status=503,
+            )
+        self.quota += QUOTA_COSTS[endpoint]
+        data = handler(request.query)
+        if "fields" in request.query:
+            data = select_fields(data, parse_fields(request.query["fields"]))
+        body = json.dumps(data)
+        self.bytes += len(body)
+        return web.Response(text=body, content_type="application/json")
+
+
+def make_app(fake: FakeYouTube) -> web.Application:
+    """
+    aiohttp приложение, которое отвечает на запросы вида /youtube/v3/<метод>
+    """
+    app = web.Application()
+    app.router.add_get("/youtube/v3/{endpoint}", fake.handle)
+    return app
@@ -1,16 +1,25 @@
+import _tkinter
 import tkinter as tk
-from asyncio import sleep
+from asyncio import get_event_loop, sleep
 from datetime import date
+from time import monotonic
 from typing import Callable, List
 
 from idlelib.tooltip import Hovertip
 from tkcalendar import DateEntry
 
+from progress import Progress
 from settings import Settings
 
 
 class Gui:
-    interval = 0.1  # Период обновления окна в секундах
+    # Период опроса событий окна в секундах: пока пользователь что-то делает в окне, события разбираются часто,
+    # а в простое период удваивается до максимального. Ход загрузки на опрос не влияет: счётчики перерисовываются
+    # по изменениям Progress. Первое нажатие после долгого простоя может ждать до max_interval, но движение мыши
+    # к кнопке обычно успевает вернуть частый опрос
+    min_interval = 0.02
+    max_interval = 0.5
+    progress_interval = 0.5  # Как часто перерисовывать счётчики хода выполнения
 
     def __init__(self, run_callback: Callable, close_callback: Callable):
         self._root = tk.Tk()
@@ -36,8 +45,12 @@ class Gui:
         self._api = tk.StringVar()
         key_entry = tk.Entry(master=self._root, textvariable=self._api, width=40)
         key_entry.pack()
-        self._api.set(Settings.api_key())
-        Hovertip(key_entry, text="Ваш Google API Key для доступа к YouTube")
+        self._api.set(", ".join(Settings.api_keys()))
+        Hovertip(
+            key_entry,
+            text="Ваш Google API Key для доступа к YouTube. Можно указать несколько ключей через запятую:\n"
+            "когда у одного ключа закончится квота, программа продолжит работу со следующим",
+        )
 
         self._bots_frame = tk.LabelFrame(self._root, text="Группы ботов", width=40)
         Hovertip(
@@ -81,13 +94,73 @@ class Gui:
             "по каналам",
         )
 
+        self._uploads_playlist = tk.IntVar(value=0)
+        uploads_playlist = tk.Checkbutton(
+            text="Искать видео через плейлисты загрузок",
+            variable=self._uploads_playlist,
+        )
+        uploads_playlist.pack()
+        Hovertip(
+            uploads_playlist,
+            "Если этот пункт выбран, видео каналов ищутся через плейлисты загрузок. Это в сто раз дешевле по квоте,\n"
+            "чем поиск, поэтому за один запуск можно обойти гораздо больше каналов",
+        )
+
+        self._comments_since_date = tk.IntVar(value=0)
+        comments_since_date = tk.Checkbutton(
+            text="Только комментарии после даты отсечки",
+            variable=self._comments_since_date,
+        )
+        comments_since_date.pack()
+        Hovertip(
+            comments_since_date,
+            "Если этот пункт выбран, скачиваются только ветки комментариев, начатые после даты отсечки, в том числе\n"
+            "под видео из videos.txt. Для старых, но всё ещё обсуждаемых видео это несколько страниц вместо сотен",
+        )
+
+        self._export_texts = tk.IntVar(value=1)
+        export_texts = tk.Checkbutton(
+            text="Сохранять тексты комментариев", variable=self._export_texts
+        )
+        export_texts.pack()
+        Hovertip(
+            export_texts,
+            "Если этот пункт не выбран, сохраняется только статистика. Тексты комментариев тогда не скачиваются\n"
+            "(если не включён архив комментариев), и загрузка идёт быстрее",
+        )
+
+        self._authors_info = tk.IntVar(value=0)
+        authors_info = tk.Checkbutton(
+            text="Добавить информацию об авторах", variable=self._authors_info
+        )
+        authors_info.pack()
+        Hovertip(
+            authors_info,
+            "Если этот пункт выбран, в статистику добавляются дата регистрации, число подписчиков и число видео\n"
+            "каждого автора. Информация запрашивается пачками по 50 каналов, одна единица квоты на пачку",
+        )
+
         self._start_btn = tk.Button(
             master=self._root, text="Начать", command=lambda: run_callback(self)
         )
         self._start_btn.pack()
 
+        self._progress_label = tk.Label(width=40, justify=tk.LEFT)
+        self._progress_label.pack(padx=5, pady=5)
+
+        # Изменение счётчиков планирует перерисовку в цикле asyncio не чаще progress_interval
+        self._progress = Progress()
+        self._redraw = None
+        self._rendered = 0.0
+        self._progress.subscribe(self._on_progress)
+
         self._root.protocol("WM_DELETE_WINDOW", close_callback)
 
+    def _on_progress(self):
+        if self._redraw is None:
+            delay = max(self._rendered + self.progress_interval - monotonic(), 0)
+            self._redraw = get_event_loop().call_later(delay, self._render_progress)
+
     def disable(self):
         self._start_btn.config(state=tk.DISABLED)
 
@@ -107,16 +180,62 @@ class Gui:
     def video_stat(self):
         return bool(self._video_stat.get())
 
+    @property
+    def uploads_playlist(self) -> bool:
+        return bool(self._uploads_playlist.get())
+
+    @property
+    def comments_since_date(self) -> bool:
+        return bool(self._comments_since_date.get())
+
+    @property
+    def export_texts(self) -> bool:
+        return bool(self._export_texts.get())
+
+    @property
+    def authors_info(self) -> bool:
+        return bool(self._authors_info.get())
+
     @property
     def api(self) -> str:
         return self._api.get()
 
+    @property
+    def progress(self) -> Progress:
+        return self._progress
+
+    def _process_events(self) -> bool:
+        """
+        Разобрать все накопившиеся события окна, не дожидаясь новых
+        :return: было ли хотя бы одно событие
+        """
+        processed = False
+        while self._root.tk.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
+            processed = True
+        return processed
+
+    def _render_progress(self):
+        self._redraw = None
+        self._rendered = monotonic()
+        try:
+            self._progress_label["text"] = str(self._progress)
+            # Перерисовать окно сразу, не дожидаясь следующего опроса событий
+            self._root.update_idletasks()
+        except tk.TclError as e:
+            if "application has been destroyed" not in e.args[0]:
+                raise
+
     async def run(self):
         # По образцу https://gist.github.com/Lucretiel/e7d9a50b7b1960a56a1c
+        interval = self.min_interval
         try:
             while True:
-                self._root.update()
-                await sleep(self.interval)
+                interval = (
+                    self.min_interval
+                    if self._process_events()
+                    else min(interval * 2, self.max_interval)
+                )
+                await sleep(interval)
         except tk.TclError as e:
             if "application has been destroyed" not in e.args[0]:
                 raise
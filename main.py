@@ -1,17 +1,127 @@
+import argparse
 import asyncio
 import logging
+from contextlib import ExitStack
 from datetime import date, datetime
 from itertools import chain
-from statistics import (export_comments_text_statistics, export_statistics,
-                        get_comments_text_statistics, get_statistics)
-from typing import Iterable, List, Optional
+from statistics import CommentsTextWriter, CompactStatistics, export_statistics
+from typing import (TYPE_CHECKING, AbstractSet, Awaitable, Callable, List,
+                    Optional, TypeVar)
 
 from aiohttp import ClientSession
 
 from antikremlebot import AntiIraApi
-from gui import Gui
+from progress import Progress
 from settings import Settings
-from youtube import ChannelVideo, Comment, YouTubeApi
+from youtube import (AdaptiveLimiter, ChannelVideo, Comment, CommentArchive,
+                     CommentBudget, KeyPool, NoWorkingKeys, QuotaExhausted,
+                     QuotaScheduler, ResponseCache, Telemetry, WatermarkStore,
+                     YouTubeApi)
+
+if TYPE_CHECKING:
+    from gui import Gui
+
+T = TypeVar("T")
+
+# Сколько скачанных, но ещё не обработанных комментариев может ждать в очереди
+COMMENTS_QUEUE_SIZE = 10000
+
+
+async def until_quota_exhausted(awaitable: Awaitable[T], default: T) -> T:
+    """
+    Дождаться результата; если квота закончилась, вернуть значение по умолчанию,
+    чтобы сохранить то, что уже успели скачать
+    """
+    try:
+        return await awaitable
+    except QuotaExhausted:
+        return default
+
+
+async def stream_comments(
+    youtube_api: YouTubeApi,
+    video: ChannelVideo,
+    queue: asyncio.Queue,
+    budget: Optional[CommentBudget] = None,
+    authors: Optional[AbstractSet[str]] = None,
+    progress: Optional[Progress] = None,
+    since: Optional[datetime] = None,
+):
+    """
+    Скачивать комментарии под видео в очередь. Если очередь заполнена, загрузка ждёт, пока её разберут
+    :param youtube_api: YouTube API
+    :param video: видео
+    :param queue: очередь комментариев
+    :param budget: ограничения на число скачиваемых комментариев
+    :param authors: класть в очередь только комментарии этих авторов (см. YouTubeApi.list_comments)
+    :param progress: ход выполнения, в котором отмечается обработанное видео
+    :param since: скачивать только ветки комментариев, начатые не раньше этого момента
+    """
+    count = 0
+    try:
+        async for comment in youtube_api.list_comments(
+            video.code, video.channel, authors, budget, since
+        ):
+            await queue.put(comment)
+            count += 1
+    except QuotaExhausted:
+        logging.warning(
+            "Quota exhausted, video "
+            + video.code
+            + " has only "
+            + str(count)
+            + " comments fetched"
+        )
+    finally:
+        if progress:
+            progress.video_done()
+
+
+async def consume_comments(
+    queue: asyncio.Queue, consumers: List[Callable[[Comment], None]]
+):
+    """
+    Разбирать очередь комментариев, пока не придёт None
+    :param queue: очередь комментариев
+    :param consumers: обработчики, каждый получает каждый комментарий
+    """
+    while True:
+        comment = await queue.get()
+        if comment is None:
+            return
+        for consumer in consumers:
+            consumer(comment)
+
+
+async def pipe_comments(
+    producers: List[Awaitable],
+    queue: asyncio.Queue,
+    consumers: List[Callable[[Comment], None]],
+):
+    """
+    Скачивать комментарии в очередь и одновременно разбирать её.
+    Если обработчик упадёт (например, при ошибке записи на диск), загрузка отменяется и ошибка пробрасывается
+    дальше: иначе загрузка навсегда заснула бы на заполненной очереди
+    :param producers: загрузки, которые кладут комментарии в очередь (например, stream_comments)
+    :param queue: очередь комментариев
+    :param consumers: обработчики, каждый получает каждый комментарий
+    """
+
+    async def produce():
+        await asyncio.gather(*producers)
+        await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    consumer = asyncio.ensure_future(consume_comments(queue, consumers))
+    try:
+        done, _ = await asyncio.wait(
+            [producer, consumer], return_when=asyncio.FIRST_EXCEPTION
+        )
+        for task in done:
+            task.result()
+    finally:
+        producer.cancel()
+        consumer.cancel()
 
 
 async def main(
@@ -20,80 +130,253 @@ async def main(
     bot_groups: List[str],
     ignore_bots: bool,
     export_videos: bool = False,
+    uploads_playlist: bool = False,
+    authors_info: bool = False,
+    progress: Optional[Progress] = None,
+    comments_since_date: bool = False,
+    export_texts: bool = True,
 ):
     """
     Запустить алгоритм выгрузки и анализа
-    :param api_key: google API ключ
+    :param api_key: google API ключ (или несколько ключей через запятую)
     :param video_date: отсечка по дате публикации видео
     :param bot_groups: группы ботов, статистику по которым нужно собрать
     :param ignore_bots: группы ботов, которых нужно игнорировать в статистике
     :param export_videos: экспортировать статистику по видео
+    :param uploads_playlist: искать видео каналов через плейлисты загрузок (1 единица квоты за страницу)
+                             вместо поиска (100 единиц за страницу)
+    :param authors_info: добавить в статистику информацию о каналах авторов комментариев
+    :param progress: ход выполнения, который обновляется по мере работы (его показывает окно программы)
+    :param comments_since_date: скачивать только комментарии, оставленные после даты отсечки (и под видео из
+                                videos.txt): страницы комментариев перестают качаться на первой более старой ветке
+    :param export_texts: сохранить тексты комментариев. Если тексты не нужны ни для файла, ни для архива,
+                         они не запрашиваются у API
     :return:
     """
-    async with ClientSession() as session:
-        # Взять список ботов
-        bot_list_fetcher = AntiIraApi(session)
-        bot_list = [bot.user for bot in await bot_list_fetcher.get_bot_list(bot_groups)]
-
-        youtube_api = YouTubeApi(api_key, session)
-
-        # Взять список каналов для анализа
-        channels = AntiIraApi.get_channels_list()
-        video_datetime = datetime(video_date.year, video_date.month, video_date.day)
-
-        logging.info("Fetch channels...")
-        # Скачать идентификаторы видео для каждого канала
-        tasks = [
-            youtube_api.list_videos_by_channel(channel, video_datetime)
-            for channel in channels
-        ]
-        videos_groups = await asyncio.gather(*tasks)
-        for channel, videos_in_channel in zip(channels, videos_groups):
-            logging.info(
-                "Channel " + channel + " has " + str(len(videos_in_channel)) + " videos"
+    # Базы и файлы закрываются и при ошибке загрузки: иначе архив потеряет ещё не записанные комментарии
+    with ExitStack() as resources:
+        # Кэш ответов API, чтобы повторные запуски не тратили квоту
+        cache = None
+        if Settings.cache_path():
+            cache = ResponseCache(Settings.cache_path(), max_size=Settings.cache_size())
+            resources.callback(cache.close)
+        # Отметки для инкрементальной загрузки: скачивать только новые комментарии
+        watermarks = None
+        if Settings.watermarks_path():
+            watermarks = WatermarkStore(Settings.watermarks_path())
+            resources.callback(watermarks.close)
+        # Архив всех скачанных комментариев, по которому потом можно пересобрать статистику без API
+        archive = None
+        if Settings.archive_path():
+            archive = resources.enter_context(CommentArchive(Settings.archive_path()))
+        # Расход квоты в пределах дневного бюджета; когда он кончится, статистика соберётся по тому, что уже скачано
+        # У каждого ключа своя квота, запросы распределяются между ключами
+        keys = KeyPool(
+            [key.strip() for key in api_key.split(",")], budget=Settings.daily_quota()
+        )
+        # Без ключей бюджет квоты был бы нулевым, и запуск закончился бы как "квота исчерпана"
+        if len(keys) == 0:
+            raise NoWorkingKeys("No API keys given")
+        # Число одновременных запросов подстраивается под то, сколько выдерживает API
+        limiter = AdaptiveLimiter()
+        scheduler = QuotaScheduler(
+            Settings.daily_quota() * len(keys),
+            state_path=Settings.quota_state_path(),
+            limiter=limiter,
+        )
+        # Потраченная квота сохраняется и после ошибки, чтобы следующий запуск её учёл
+        resources.callback(scheduler.save)
+        if progress is None:
+            progress = Progress()
+        progress.start(scheduler)
+
+        # Телеметрия запросов: сколько времени, трафика и квоты ушло на каждый метод API, канал и видео
+        telemetry = None
+        if Settings.telemetry_path():
+            telemetry = Telemetry(limiter)
+            resources.callback(telemetry.save, Settings.telemetry_path())
+        trace_configs = [telemetry.trace_config()] if telemetry else None
+
+        async with ClientSession(trace_configs=trace_configs) as session:
+            # Взять список ботов
+            # Списки хранятся локально и перекачиваются, только если изменились
+            bot_list_fetcher = AntiIraApi(session, Settings.bot_list_cache_path())
+            bot_list = await bot_list_fetcher.get_bot_ids(bot_groups)
+
+            youtube_api = YouTubeApi(
+                keys,
+                session,
+                cache=cache,
+                watermarks=watermarks,
+                scheduler=scheduler,
+                limiter=limiter,
+                api_url=Settings.api_url(),
+                with_text=export_texts or archive is not None,
             )
-        videos: Iterable[ChannelVideo] = chain(*videos_groups)
 
-        # Теперь добавить для анализа видео из списка videos.txt
-        additional_video_ids = AntiIraApi.get_videos_list()
-        # TODO: убирать из списка уже найденные на каналах видео
-        videos = chain(
-            videos, await youtube_api.list_videos_by_ids(additional_video_ids)
-        )
+            # Взять список каналов для анализа
+            channels = AntiIraApi.get_channels_list()
+            video_datetime = datetime(video_date.year, video_date.month, video_date.day)
+
+            logging.info("Fetch channels...")
+            progress.channels(len(channels))
+            # Скачать идентификаторы видео для каждого канала
+            if uploads_playlist:
+                # Плейлисты загрузок всех каналов находятся пачками, по одной единице квоты на 50 каналов
+                playlists = await until_quota_exhausted(
+                    youtube_api.list_uploads_playlists(channels), {}
+                )
+                for channel in channels:
+                    if channel not in playlists:
+                        logging.warning("Channel " + channel + " not found")
+                channels = [channel for channel in channels if channel in playlists]
+                progress.channels(len(channels))
+                tasks = [
+                    until_quota_exhausted(
+                        youtube_api.list_videos_by_uploads(
+                            channel, playlists[channel], video_datetime
+                        ),
+                        [],
+                    )
+                    for channel in channels
+                ]
+            else:
+                tasks = [
+                    until_quota_exhausted(
+                        youtube_api.list_videos_by_channel(channel, video_datetime), []
+                    )
+                    for channel in channels
+                ]
+
+            async def channel_videos(task: Awaitable[List[ChannelVideo]]):
+                videos_in_channel = await task
+                progress.channel_done()
+                return videos_in_channel
 
-        logging.info("Fetch comments...")
-        # Теперь найти комментарии под каждым видео
-        tasks = [
-            youtube_api.list_comments_full_list(
-                video.code, video.channel, Settings.comments_limit()
+            videos_groups = await asyncio.gather(
+                *[channel_videos(task) for task in tasks]
             )
-            for video in videos
-        ]
-        comments: Iterable[Comment] = list(chain(*await asyncio.gather(*tasks)))
+            for channel, videos_in_channel in zip(channels, videos_groups):
+                logging.info(
+                    "Channel "
+                    + channel
+                    + " has "
+                    + str(len(videos_in_channel))
+                    + " videos"
+                )
+            videos: List[ChannelVideo] = list(chain(*videos_groups))
 
-    # Теперь собрать статистику по комментариям!
-    if ignore_bots:
-        stat = get_statistics(comments, ignore_users=bot_list)
-    else:
-        stat = get_statistics(comments, use_only_users=bot_list)
+            # Теперь добавить для анализа видео из списка videos.txt (кроме уже найденных на каналах)
+            additional_video_ids = AntiIraApi.get_videos_list()
+            videos += await until_quota_exhausted(
+                youtube_api.list_videos_by_ids(additional_video_ids, known=videos), []
+            )
+
+            logging.info("Fetch comments...")
+            progress.videos(len(videos))
+            # Теперь найти комментарии под каждым видео. Комментарии сразу, по мере скачивания, идут через
+            # ограниченную очередь в статистику и в файл с текстами, поэтому память не растёт с их числом
+            if ignore_bots:
+                stat = CompactStatistics(ignore_users=bot_list)
+                authors = None
+            else:
+                stat = CompactStatistics(use_only_users=bot_list)
+                # Комментарии остальных пользователей отбрасываются сразу при разборе ответа API. Пустой список ботов
+                # (не выбрано ни одной группы) значит "без фильтра", как в статистике. Архив должен хранить все
+                # комментарии, чтобы статистику можно было пересобрать с другими фильтрами, поэтому с ним фильтр не
+                # применяется
+                authors = None if archive else bot_list or None
+            queue = asyncio.Queue(maxsize=COMMENTS_QUEUE_SIZE)
+            # Ограничения на число комментариев под видео, на канале и за весь запуск
+            budget = CommentBudget(
+                Settings.total_comments_limit(),
+                Settings.channel_comments_limit(),
+                Settings.comments_limit(),
+            )
 
-    # И экспортировать её
+            with ExitStack() as stack:
+                consumers = [stat.add, progress.comment_added]
+                if export_texts:
+                    # И ещё сохранить сами тексты комментариев
+                    texts = stack.enter_context(
+                        CommentsTextWriter(
+                            datetime.now().strftime("comments_%Y-%m-%d_%H%M%S.csv")
+                            + Settings.export_suffix()
+                        )
+                    )
+                    consumers.append(texts.add)
+                if archive:
+                    consumers.append(archive.add)
+                await pipe_comments(
+                    [
+                        stream_comments(
+                            youtube_api,
+                            video,
+                            queue,
+                            budget,
+                            authors,
+                            progress,
+                            video_datetime if comments_since_date else None,
+                        )
+                        for video in videos
+                    ],
+                    queue,
+                    consumers,
+                )
+
+            # Информация об авторах запрашивается пачками уже после загрузки комментариев, когда известны все авторы
+            channels_info = None
+            if authors_info:
+                logging.info("Fetch authors info...")
+                progress.set_stage("Загрузка информации об авторах")
+                channels_info = await until_quota_exhausted(
+                    youtube_api.get_channels_info(stat.users.values), {}
+                )
+
+        if youtube_api.skipped_comments:
+            logging.info(
+                "Skipped comments of other users: " + str(youtube_api.skipped_comments)
+            )
+        if budget.exhausted:
+            logging.warning(
+                "Comments budget exhausted: " + str(budget.spent) + " comments"
+            )
+        if scheduler.remaining == 0:
+            logging.warning("Quota budget exhausted, statistics are partial")
+        logging.info(
+            "Quota spent: " + str(scheduler.spent) + " of " + str(scheduler.budget)
+        )
+        if len(keys) > 1:
+            logging.info("Quota spent by keys: " + str(keys.stat))
+        logging.info(
+            "Concurrency limit: "
+            + str(limiter.limit)
+            + ", retries: "
+            + str(limiter.retries)
+            + ", throttled: "
+            + str(limiter.throttled)
+        )
+        if cache:
+            logging.info(
+                "Cache: " + str(cache.hits) + " hits, " + str(cache.misses) + " misses"
+            )
+
+    # Статистика по комментариям собрана, осталось экспортировать её
+    stat_name = datetime.now().strftime("stat_%Y-%m-%d_%H%M%S")
     export_statistics(
         stat,
-        datetime.now().strftime("stat_%Y-%m-%d_%H%M%S.csv"),
+        stat_name + ".csv" + Settings.export_suffix(),
         export_videos=export_videos,
+        authors_info=channels_info,
     )
+    # Снимок, чтобы потом объединять запуски за разные дни без повторной загрузки (python -m statistics merge)
+    stat.save(stat_name + ".snap")
 
-    # И ещё сохранить сами тексты комментариев
-    export_comments_text_statistics(
-        get_comments_text_statistics(comments),
-        datetime.now().strftime("comments_%Y-%m-%d_%H%M%S.csv"),
-    )
-
+    progress.finish()
     logging.info("Done")
 
 
-def run_callback(window: Gui):
+def run_callback(window: "Gui"):
     """
     Callback для кнопки "начать" в gui
     """
@@ -110,6 +393,11 @@ def run_callback(window: Gui):
             window.selected_bot_groups,
             window.ignore_bots,
             window.video_stat,
+            window.uploads_playlist,
+            window.authors_info,
+            window.progress,
+            window.comments_since_date,
+            window.export_texts,
         )
     )
 
@@ -123,8 +411,12 @@ def close_callback():
     loop.stop()
 
 
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
+def run_gui():
+    """
+    Открыть окно программы
+    """
+    # tkinter и остальное, что нужно окну, импортируется только здесь: без окна они не нужны
+    from gui import Gui
 
     loop = asyncio.get_event_loop()
 
@@ -133,3 +425,82 @@ if __name__ == "__main__":
     loop.create_task(gui.run())
 
     loop.run_forever()
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Параметры командной строки (те же, что в окне программы)
+    """
+    parser = argparse.ArgumentParser(
+        description="Статистика комментариев ботов на YouTube. Без параметров открывается окно программы, "
+        "с параметром --date программа работает без окна"
+    )
+    parser.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        help="дата отсечки (ГГГГ-ММ-ДД): искать видео на каналах, вышедшие после неё",
+    )
+    parser.add_argument(
+        "--key",
+        default=", ".join(Settings.api_keys()),
+        help="Google API ключ или несколько ключей через запятую (по умолчанию - из .env)",
+    )
+    parser.add_argument(
+        "--bots",
+        nargs="*",
+        default=[],
+        choices=list(Settings.bot_list_links()),
+        help="группы ботов",
+    )
+    parser.add_argument(
+        "--only-bots",
+        action="store_true",
+        help="учитывать только аккаунты ботов из указанных групп (по умолчанию - всех, кроме них)",
+    )
+    parser.add_argument(
+        "--videos", action="store_true", help="распределять статистику по видео"
+    )
+    parser.add_argument(
+        "--uploads", action="store_true", help="искать видео через плейлисты загрузок"
+    )
+    parser.add_argument(
+        "--comments-since-date",
+        action="store_true",
+        help="скачивать только комментарии, оставленные после даты отсечки",
+    )
+    parser.add_argument(
+        "--no-texts",
+        action="store_true",
+        help="не сохранять тексты комментариев (и не скачивать их, если не включён архив)",
+    )
+    parser.add_argument(
+        "--authors-info",
+        action="store_true",
+        help="добавить информацию об авторах комментариев",
+    )
+    parsed = parser.parse_args(args)
+    if parsed.date and not parsed.key:
+        parser.error("нужен API ключ: --key или YOUTUBE_API_KEY в .env")
+    return parsed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    arguments = parse_args()
+    if arguments.date is None:
+        run_gui()
+    else:
+        asyncio.run(
+            main(
+                arguments.key,
+                arguments.date,
+                arguments.bots,
+                not arguments.only_bots,
+                arguments.videos,
+                arguments.uploads,
+                arguments.authors_info,
+                comments_since_date=arguments.comments_since_date,
+                export_texts=not arguments.no_texts,
+            )
+        )
@@ -0,0 +1,129 @@
+"""
+Ход выполнения запуска: сколько каналов и видео обработано, сколько скачано комментариев и потрачено квоты.
+main.main обновляет счётчики по мере работы, а окно программы подписывается на изменения и показывает их
+"""
+from time import monotonic
+from typing import Callable, List, Optional
+
+from youtube import Comment, QuotaScheduler
+
+
+class Progress:
+    def __init__(self):
+        self._listeners: List[Callable[[], None]] = []
+        self._reset()
+        self.stage = "Ожидание запуска"
+
+    def _reset(self):
+        self.channels_total = 0
+        self.channels_done = 0
+        self.videos_total = 0
+        self.videos_done = 0
+        self.comments = 0
+        self.finished = False
+        self._scheduler: Optional[QuotaScheduler] = None
+        self._started = monotonic()
+        self._comments_started: Optional[float] = None
+
+    def subscribe(self, listener: Callable[[], None]):
+        """
+        Вызывать listener при каждом изменении (он должен быть быстрым: например, только помечать, что окно нужно
+        обновить)
+        """
+        self._listeners.append(listener)
+
+    def _changed(self):
+        for listener in self._listeners:
+            listener()
+
+    def start(self, scheduler: Optional[QuotaScheduler] = None):
+        """
+        Начало запуска
+        :param scheduler: планировщик, из которого берётся потраченная квота
+        """
+        self._reset()
+        self._scheduler = scheduler
+        self.stage = "Загрузка списка ботов"
+        self._changed()
+
+    def set_stage(self, stage: str):
+        self.stage = stage
+        self._changed()
+
+    def channels(self, total: int):
+        self.channels_total = total
+        self.set_stage("Поиск видео на каналах")
+
+    def channel_done(self):
+        self.channels_done += 1
+        self._changed()
+
+    def videos(self, total: int):
+        self.videos_total = total
+        self._comments_started = monotonic()
+        self.set_stage("Загрузка комментариев")
+
+    def video_done(self):
+        self.videos_done += 1
+        self._changed()
+
+    def comment_added(self, comment: Optional[Comment] = None):
+        """
+        Учесть скачанный комментарий (подходит как обработчик очереди комментариев в main.main)
+        """
+        self.comments += 1
+        self._changed()
+
+    def finish(self):
+        self.finished = True
+        self.set_stage("Готово")
+
+    @property
+    def quota_spent(self) -> int:
+        return self._scheduler.spent if self._scheduler else 0
+
+    @property
+    def quota_budget(self) -> int:
+        return self._scheduler.budget if self._scheduler else 0
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self._started
+
+    @property
+    def comments_per_second(self) -> float:
+        if self._comments_started is None:
+            return 0.0
+        elapsed = monotonic() - self._comments_started
+        return self.comments / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Сколько секунд осталось до конца загрузки комментариев (None, если оценить пока нельзя)
+        """
+        if self._comments_started is None or not self.videos_done:
+            return None
+        elapsed = monotonic() - self._comments_started
+        return elapsed / self.videos_done * (self.videos_total - self.videos_done)
+
+    def __str__(self):
+        lines = [
+            self.stage,
+            "Каналы: " + str(self.channels_done) + " из " + str(self.channels_total),
+            "Видео: " + str(self.videos_done) + " из " + str(self.videos_total),
+            "Комментарии: "
+            + str(self.comments)
+            + " ("
+            + str(round(self.comments_per_second))
+            + " в секунду)",
+        ]
+        if self._scheduler:
+            lines.append(
+                "Квота: " + str(self.quota_spent) + " из " + str(self.quota_budget)
+            )
+        eta = self.eta
+        if eta is not None and not self.finished:
+            minutes, seconds = divmod(int(eta), 60)
+            lines.append("Осталось: " + str(minutes) + " мин " + str(seconds) + " с")
+        return "\n".join(lines)
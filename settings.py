@@ -1,5 +1,5 @@
 from os import getenv
-from typing import Dict
+from typing import Dict, List
 
 from dotenv import find_dotenv, load_dotenv
 
@@ -12,6 +12,10 @@ class Settings:
     def api_key(cls) -> str:
         return getenv("YOUTUBE_API_KEY")
 
+    @classmethod
+    def api_url(cls) -> str:
+        return getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3/")
+
     @classmethod
     def bot_list_links(cls) -> Dict[str, str]:
         return {
@@ -19,6 +23,65 @@ class Settings:
             "KB": "https://raw.githubusercontent.com/FeignedAccomplice/YOUTUBOTS/master/KB.CSV",
         }
 
+    @classmethod
+    def bot_list_cache_path(cls) -> str:
+        return getenv("BOT_LIST_CACHE_PATH", "")
+
     @classmethod
     def comments_limit(cls) -> int:
         return int(getenv("COMMENTS_LIMIT", 0))
+
+    @classmethod
+    def channel_comments_limit(cls) -> int:
+        return int(getenv("CHANNEL_COMMENTS_LIMIT", 0))
+
+    @classmethod
+    def total_comments_limit(cls) -> int:
+        return int(getenv("TOTAL_COMMENTS_LIMIT", 0))
+
+    @classmethod
+    def cache_path(cls) -> str:
+        return getenv("CACHE_PATH", "")
+
+    @classmethod
+    def cache_size(cls) -> int:
+        return int(getenv("CACHE_SIZE_MB", 256)) * 1024 * 1024
+
+    @classmethod
+    def watermarks_path(cls) -> str:
+        return getenv("WATERMARKS_PATH", "")
+
+    @classmethod
+    def archive_path(cls) -> str:
+        return getenv("ARCHIVE_PATH", "")
+
+    @classmethod
+    def export_suffix(cls) -> str:
+        """
+        Что дописать к именам файлов с результатами: ".gz", ".bz2" или ".xz" - сжать, ".ndjson" - писать NDJSON
+        """
+        return getenv("EXPORT_SUFFIX", "")
+
+    @classmethod
+    def telemetry_path(cls) -> str:
+        """
+        Куда сохранить телеметрию запросов (<путь>.json и <путь>.prom); пустая строка - не сохранять
+        """
+        return getenv("TELEMETRY_PATH", "")
+
+    @classmethod
+    def daily_quota(cls) -> int:
+        return int(getenv("DAILY_QUOTA", 10000))
+
+    @classmethod
+    def quota_state_path(cls) -> str:
+        return getenv("QUOTA_STATE_PATH", "")
+
+    @classmethod
+    def api_keys(cls) -> List[str]:
+        """
+        Все API ключи: YOUTUBE_API_KEY и список через запятую в YOUTUBE_API_KEYS
+        """
+        keys = [getenv("YOUTUBE_API_KEY", "")]
+        keys += getenv("YOUTUBE_API_KEYS", "").split(",")
+        return [key for key in dict.fromkeys(key.strip() for key in keys) if key]
@@ -1,9 +1,16 @@
-from .statistics import (export_comments_text_statistics, export_statistics,
-                         get_comments_text_statistics, get_statistics)
+from .compact import CompactStatistics
+from .export import ExportWriter, export_rows
+from .statistics import (CommentsTextWriter, export_comments_text_statistics,
+                         export_statistics, get_comments_text_statistics,
+                         get_statistics)
 
 __all__ = [
     "get_statistics",
     "export_statistics",
     "export_comments_text_statistics",
     "get_comments_text_statistics",
+    "CompactStatistics",
+    "CommentsTextWriter",
+    "ExportWriter",
+    "export_rows",
 ]
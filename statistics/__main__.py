@@ -0,0 +1,109 @@
+"""
+Работа со снимками статистики (файлы stat_<дата>.snap, которые сохраняет main.py):
+    python -m statistics merge итог.csv stat_1.snap stat_2.snap ...  - объединить несколько запусков в одну таблицу
+    python -m statistics diff итог.csv stat_old.snap stat_new.snap   - что изменилось между двумя запусками
+И с архивом комментариев (ARCHIVE_PATH):
+    python -m statistics archive итог.csv archive.sqlite --ignore bots.txt - статистика по архиву без обращения к API
+    python -m statistics comments тексты.csv archive.sqlite --author UC... - комментарии из архива
+"""
+import argparse
+from datetime import datetime
+from typing import List
+
+from youtube import CommentArchive
+
+from .compact import CompactStatistics
+from .statistics import CommentsTextWriter, export_statistics
+
+
+def read_users(path: str) -> List[str]:
+    """
+    Прочитать список пользователей: по одному идентификатору в строке (формат списков ботов "UC...=дата" тоже
+    подходит)
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return [
+            line.split("=")[0].strip()
+            for line in file
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def add_archive_filters(parser: argparse.ArgumentParser):
+    parser.add_argument("archive", help="файл архива комментариев")
+    parser.add_argument("--channel", help="только комментарии под видео канала")
+    parser.add_argument("--video", help="только комментарии под видео")
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="только комментарии, оставленные не раньше даты (ГГГГ-ММ-ДД)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m statistics")
+    parser.add_argument(
+        "--videos", action="store_true", help="экспортировать статистику по видео"
+    )
+    parser.add_argument("--snapshot", help="сохранить результат ещё и как снимок")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    merge = commands.add_parser("merge", help="объединить снимки")
+    merge.add_argument("outfile", help="файл таблицы")
+    merge.add_argument("snapshots", nargs="+", help="снимки статистики")
+
+    diff = commands.add_parser("diff", help="разница двух снимков (new - old)")
+    diff.add_argument("outfile", help="файл таблицы")
+    diff.add_argument("old", help="старый снимок")
+    diff.add_argument("new", help="новый снимок")
+
+    archive = commands.add_parser("archive", help="статистика по архиву комментариев")
+    archive.add_argument("outfile", help="файл таблицы")
+    add_archive_filters(archive)
+    archive.add_argument(
+        "--ignore", help="файл со списком пользователей, которых нужно игнорировать"
+    )
+    archive.add_argument("--only", help="файл со списком пользователей для статистики")
+
+    comments = commands.add_parser("comments", help="тексты комментариев из архива")
+    comments.add_argument("outfile", help="файл таблицы")
+    add_archive_filters(comments)
+    comments.add_argument("--author", help="только комментарии пользователя")
+
+    args = parser.parse_args()
+    if args.command == "comments":
+        with CommentArchive(args.archive) as source, CommentsTextWriter(
+            args.outfile
+        ) as texts:
+            for comment in source.comments(
+                args.author, args.channel, args.video, args.since
+            ):
+                texts.add(comment)
+        return
+
+    if args.command == "archive":
+        stat = CompactStatistics(
+            ignore_users=read_users(args.ignore) if args.ignore else None,
+            use_only_users=read_users(args.only) if args.only else None,
+        )
+        with CommentArchive(args.archive) as source:
+            for comment in source.comments(
+                channel=args.channel, video=args.video, since=args.since
+            ):
+                stat.add(comment)
+    elif args.command == "merge":
+        stat = CompactStatistics.merged(
+            CompactStatistics.load(path) for path in args.snapshots
+        )
+    else:
+        stat = CompactStatistics.diff(
+            CompactStatistics.load(args.old), CompactStatistics.load(args.new)
+        )
+
+    export_statistics(stat, args.outfile, export_videos=args.videos)
+    if args.snapshot:
+        stat.save(args.snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Компактное хранение статистики комментариев.
+Идентификаторы пользователей, каналов и видео заменяются целочисленными кодами, а счётчики хранятся в массивах,
+поэтому даже миллионы комментариев занимают немного памяти и обрабатываются быстро
+"""
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from youtube import Comment
+
+# Код видео занимает младшие 32 бита ключа строки, код пользователя - старшие
+_VIDEO_BITS = 32
+
+# Заголовок файла снимка статистики (см. CompactStatistics.save)
+_SNAPSHOT_MAGIC = b"IRASTAT1"
+
+
+class Interner:
+    def __init__(self):
+        """
+        Словарь строка <-> целочисленный код (коды выдаются по порядку, начиная с 0)
+        """
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def code(self, value: str) -> int:
+        """
+        Код строки; если строка встречается впервые, ей выдаётся новый код
+        """
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+
+    def get(self, value: str) -> Optional[int]:
+        """
+        Код строки или None, если строка не встречалась
+        """
+        return self._codes.get(value)
+
+    def value(self, code: int) -> str:
+        return self._values[code]
+
+    @property
+    def values(self) -> List[str]:
+        return self._values
+
+    def __len__(self):
+        return len(self._values)
+
+
+class CompactStatistics:
+    def __init__(
+        self,
+        ignore_users: Optional[Iterable[str]] = None,
+        use_only_users: Optional[Iterable[str]] = None,
+    ):
+        """
+        Статистика комментариев: сколько комментариев оставил пользователь под видео с канала.
+        Строка статистики - (пользователь, канал, видео, количество), каждый столбец хранится в отдельном массиве
+        :param ignore_users: список пользователей, которых нужно игнорировать
+        :param use_only_users: список пользователей для составления статистики; пользователи не из списка будут
+                               игнорироваться
+        """
+        self._ignore_users = frozenset(ignore_users or ())
+        self._use_only_users = frozenset(use_only_users or ())
+
+        self.users = Interner()
+        self.channels = Interner()
+        self.videos = Interner()
+
+        self._user_column = array("I")
+        self._channel_column = array("I")
+        self._video_column = array("I")
+        # Количество со знаком: в разнице двух снимков (см. diff) оно может быть отрицательным
+        self._count_column = array("q")
+        # (код пользователя, код видео) упакованы в одно число -> номер строки. Видео однозначно определяет канал
+        self._rows: Dict[int, int] = {}
+
+    def add(self, comment: Comment):
+        """
+        Учесть комментарий в статистике
+        """
+        self.add_count(comment.author, comment.channel, comment.video, 1)
+
+    def add_count(self, user: str, channel: str, video: str, count: int):
+        """
+        Добавить к статистике count комментариев пользователя под видео
+        """
+        # Это бот, игнорировать его
+        if self._ignore_users and user in self._ignore_users:
+            return
+        # Пользователь не из списка, игнорировать
+        if self._use_only_users and user not in self._use_only_users:
+            return
+        # Это канал комментирует сам себя, игнорировать
+        if user == channel:
+            return
+
+        self._add_codes(
+            self.users.code(user),
+            self.channels.code(channel),
+            self.videos.code(video),
+            count,
+        )
+
+    def _add_codes(
+        self, user_code: int, channel_code: int, video_code: int, count: int
+    ):
+        key = (user_code << _VIDEO_BITS) | video_code
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = len(self._count_column)
+            self._user_column.append(user_code)
+            self._channel_column.append(channel_code)
+            self._video_column.append(video_code)
+            self._count_column.append(count)
+        else:
+            self._count_column[row] += count
+
+    def merge(self, other: "CompactStatistics", sign: int = 1) -> "CompactStatistics":
+        """
+        Добавить к статистике другую статистику (за линейное время от её размера).
+        Фильтры пользователей к добавляемой статистике не применяются
+        :param other: другая статистика
+        :param sign: 1 - сложить счётчики, -1 - вычесть
+        :return: self
+        """
+        users = [self.users.code(value) for value in other.users.values]
+        channels = [self.channels.code(value) for value in other.channels.values]
+        videos = [self.videos.code(value) for value in other.videos.values]
+        for user, channel, video, count in zip(
+            other._user_column,
+            other._channel_column,
+            other._video_column,
+            other._count_column,
+        ):
+            self._add_codes(users[user], channels[channel], videos[video], sign * count)
+        return self
+
+    @classmethod
+    def merged(cls, snapshots: Iterable["CompactStatistics"]) -> "CompactStatistics":
+        """
+        Объединить несколько статистик (например, снимки запусков за разные дни) в одну
+        """
+        result = cls()
+        for snapshot in snapshots:
+            result.merge(snapshot)
+        return result
+
+    @classmethod
+    def diff(
+        cls, old: "CompactStatistics", new: "CompactStatistics"
+    ) -> "CompactStatistics":
+        """
+        Разница двух статистик: new - old. Строки, которые не изменились, в разницу не попадают
+        """
+        return cls().merge(new).merge(old, -1)
+
+    def __len__(self):
+        return len(self._count_column)
+
+    def _grouped_rows(self) -> Iterator[List[int]]:
+        """
+        Номера строк, сгруппированные по (пользователь, канал): пользователи и каналы идут в порядке
+        первого появления, как в словаре Statistics
+        """
+        # Строки с нулевым количеством бывают только в разнице снимков, в ней они не нужны
+        order = sorted(
+            (row for row in range(len(self)) if self._count_column[row]),
+            key=self._user_column.__getitem__,
+        )
+        start = 0
+        while start < len(order):
+            user = self._user_column[order[start]]
+            end = start
+            groups: Dict[int, List[int]] = {}
+            while end < len(order) and self._user_column[order[end]] == user:
+                row = order[end]
+                groups.setdefault(self._channel_column[row], []).append(row)
+                end += 1
+            yield from groups.values()
+            start = end
+
+    def rows(self) -> Iterator[Tuple[str, str, str, int]]:
+        """
+        Строки статистики (пользователь, канал, видео, количество комментариев)
+        """
+        for group in self._grouped_rows():
+            for row in group:
+                yield (
+                    self.users.value(self._user_column[row]),
+                    self.channels.value(self._channel_column[row]),
+                    self.videos.value(self._video_column[row]),
+                    self._count_column[row],
+                )
+
+    def channel_rows(self) -> Iterator[Tuple[str, str, int]]:
+        """
+        Строки статистики по каналам (пользователь, канал, количество комментариев под всеми видео канала)
+        """
+        for group in self._grouped_rows():
+            row = group[0]
+            yield (
+                self.users.value(self._user_column[row]),
+                self.channels.value(self._channel_column[row]),
+                sum(self._count_column[row] for row in group),
+            )
+
+    @property
+    def statistics(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Статистика в виде вложенных словарей (см. Statistics)
+        """
+        stat = dict()
+        for user, channel, video, count in self.rows():
+            stat.setdefault(user, dict()).setdefault(channel, dict())[video] = count
+        return stat
+
+    def save(self, path: str):
+        """
+        Сохранить снимок статистики в двоичный файл: заголовок и сжатые zlib таблицы строк и столбцы
+        """
+        payload = bytearray()
+        for interner in (self.users, self.channels, self.videos):
+            strings = "\n".join(interner.values).encode("utf-8")
+            payload += struct.pack("<II", len(interner), len(strings)) + strings
+        payload += struct.pack("<I", len(self))
+        for column in (
+            self._user_column,
+            self._channel_column,
+            self._video_column,
+            self._count_column,
+        ):
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            payload += column.tobytes()
+
+        with open(path, "wb") as file:
+            file.write(_SNAPSHOT_MAGIC)
+            file.write(zlib.compress(bytes(payload)))
+
+    @classmethod
+    def load(cls, path: str) -> "CompactStatistics":
+        """
+        Загрузить снимок статистики, сохранённый через save
+        """
+        with open(path, "rb") as file:
+            if file.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(path + " is not a statistics snapshot")
+            payload = zlib.decompress(file.read())
+
+        stat = cls()
+        offset = 0
+        for interner in (stat.users, stat.channels, stat.videos):
+            count, size = struct.unpack_from("<II", payload, offset)
+            offset += 8
+            if count:
+                for value in (
+                    payload[offset : offset + size].decode("utf-8").split("\n")
+                ):
+                    interner.code(value)
+            offset += size
+        (rows,) = struct.unpack_from("<I", payload, offset)
+        offset += 4
+        for column in (
+            stat._user_column,
+            stat._channel_column,
+            stat._video_column,
+            stat._count_column,
+        ):
+            size = rows * column.itemsize
+            column.frombytes(payload[offset : offset + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+            offset += size
+
+        stat._rows = {
+            (user << _VIDEO_BITS) | video: row
+            for row, (user, video) in enumerate(
+                zip(stat._user_column, stat._video_column)
+            )
+        }
+        return stat
@@ -0,0 +1,124 @@
+"""
+Потоковый экспорт таблиц.
+Строки берутся из итератора и пишутся в файл большими кусками по мере того, как они готовы, поэтому для экспорта
+не нужно держать всю таблицу в памяти. Файл можно сразу сжать (по расширению .gz, .bz2 или .xz), а вместо таблицы
+с разделителем-табуляцией записать NDJSON (расширение .ndjson или .jsonl, в том числе со сжатием: .ndjson.gz)
+"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+from typing import Iterable, List, Optional, Sequence
+
+# Сколько символов накапливается в памяти перед записью в файл
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+# Расширение файла -> функция открытия сжатого файла на запись в текстовом режиме
+_COMPRESSORS = {
+    ".gz": lambda path: gzip.open(path, "wt", encoding="utf-8", compresslevel=6),
+    ".bz2": lambda path: bz2.open(path, "wt", encoding="utf-8"),
+    ".xz": lambda path: lzma.open(path, "wt", encoding="utf-8"),
+}
+
+_NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+def _split_compression(path: str):
+    """
+    Отделить от пути расширение сжатия
+    :return: (путь без расширения сжатия, функция открытия сжатого файла или None)
+    """
+    for extension, opener in _COMPRESSORS.items():
+        if path.endswith(extension):
+            return path[: -len(extension)], opener
+    return path, None
+
+
+class ExportWriter:
+    def __init__(
+        self,
+        path: str,
+        header: List[str],
+        ndjson: Optional[bool] = None,
+        buffer_size: int = EXPORT_BUFFER_SIZE,
+    ):
+        """
+        Запись таблицы в файл
+        :param path: файл таблицы; сжатие выбирается по расширению
+        :param header: названия столбцов
+        :param ndjson: писать NDJSON (каждая строка - JSON объект с ключами из header) вместо таблицы с табуляцией;
+                       по умолчанию выбирается по расширению
+        :param buffer_size: сколько символов накапливать перед записью в файл
+        """
+        self._path = path
+        self._header = header
+        self._buffer_size = buffer_size
+        name, self._opener = _split_compression(path)
+        self._ndjson = name.endswith(_NDJSON_EXTENSIONS) if ndjson is None else ndjson
+        self._file = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, delimiter="\t")
+
+    def __enter__(self):
+        if self._opener:
+            self._file = self._opener(self._path)
+        else:
+            self._file = open(self._path, "w", encoding="utf-8")
+        if not self._ndjson:
+            self._writer.writerow(self._header)
+        return self
+
+    def write(self, row: Sequence):
+        """
+        Записать строку таблицы
+        """
+        if self._ndjson:
+            self._buffer.write(
+                json.dumps(dict(zip(self._header, row)), ensure_ascii=False) + "\n"
+            )
+        else:
+            self._writer.writerow(row)
+        if self._buffer.tell() >= self._buffer_size:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[Sequence]):
+        """
+        Записать строки таблицы по мере их получения из итератора
+        """
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """
+        Записать накопленные строки в файл
+        """
+        data = self._buffer.getvalue()
+        if data:
+            self._file.write(data)
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def __exit__(self, *args):
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+
+def export_rows(
+    rows: Iterable[Sequence],
+    path: str,
+    header: List[str],
+    ndjson: Optional[bool] = None,
+):
+    """
+    Экспортировать строки из итератора в файл (см. ExportWriter)
+    :param rows: строки таблицы
+    :param path: файл таблицы
+    :param header: названия столбцов
+    :param ndjson: писать NDJSON вместо таблицы с табуляцией (по умолчанию - по расширению файла)
+    """
+    with ExportWriter(path, header, ndjson) as writer:
+        writer.write_rows(rows)
@@ -1,7 +1,9 @@
-import csv
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
-from youtube import Comment
+from youtube import ChannelInfo, Comment
+
+from .compact import CompactStatistics
+from .export import ExportWriter, export_rows
 
 """
 Имя пользователя, на какие каналы подписан, 
@@ -47,51 +49,77 @@ def get_statistics(
                            игнорироваться
     :return: Статистика
     """
-    stat = dict()
+    compact = CompactStatistics(ignore_users, use_only_users)
     for comment in comments:
-        # Это бот, игнорировать его
-        if ignore_users and comment.author in ignore_users:
-            continue
-        # Пользователь не из списка, игнорировать
-        if use_only_users and comment.author not in use_only_users:
-            continue
-        # Это канал комментирует сам себя, игнорировать
-        if comment.author == comment.channel:
-            continue
-        if comment.author not in stat:
-            stat[comment.author] = dict()
-        if comment.channel not in stat[comment.author]:
-            stat[comment.author][comment.channel] = dict()
-        if comment.video not in stat[comment.author][comment.channel]:
-            stat[comment.author][comment.channel][comment.video] = 0
-
-        stat[comment.author][comment.channel][comment.video] += 1
-
-    return stat
-
-
-def export_statistics(stat: Statistics, path: str, export_videos: bool = False):
+        compact.add(comment)
+    return compact.statistics
+
+
+def _statistics_rows(
+    stat: Union[Statistics, CompactStatistics], export_videos: bool
+) -> Iterator[List]:
+    """
+    Строки таблицы статистики: пользователь, канал, видео (если export_videos), количество комментариев
+    """
+    if isinstance(stat, CompactStatistics):
+        if not export_videos:
+            for user, channel, total_channel_count in stat.channel_rows():
+                yield [user, channel, "", total_channel_count]
+        else:
+            for row in stat.rows():
+                yield list(row)
+    elif not export_videos:
+        for user, channels in stat.items():
+            for channel, videos in channels.items():
+                total_channel_count = sum(videos.values())
+                yield [user, channel, "", total_channel_count]
+    else:
+        for user, channels in stat.items():
+            for channel, videos in channels.items():
+                for video, count in videos.items():
+                    yield [user, channel, video, count]
+
+
+def _with_authors_info(
+    rows: Iterable[List], authors_info: Dict[str, ChannelInfo]
+) -> Iterator[List]:
+    """
+    Добавить к строкам статистики информацию об авторе: дату регистрации, число подписчиков и число видео
+    """
+    for row in rows:
+        info = authors_info.get(row[0])
+        if info:
+            row += [
+                info.registration_date.date().isoformat(),
+                info.subscribers_count,
+                info.video_count,
+            ]
+        else:  # Канал удалён или не успели получить информацию
+            row += ["", "", ""]
+        yield row
+
+
+def export_statistics(
+    stat: Union[Statistics, CompactStatistics],
+    path: str,
+    export_videos: bool = False,
+    authors_info: Optional[Dict[str, ChannelInfo]] = None,
+):
     """
     Экспортировать статистику в файл
-    :param stat: статистика
-    :param path: файл таблицы
+    :param stat: статистика (вложенные словари или CompactStatistics)
+    :param path: файл таблицы (сжатие и формат выбираются по расширению, см. ExportWriter)
     :param export_videos: экспоритровать статистику по видео тоже
+    :param authors_info: информация о каналах авторов (см. YouTubeApi.get_channels_info); если указана, в таблицу
+                         добавляются дата регистрации, число подписчиков и число видео автора
     :return:
     """
-    with open(path, "w", encoding="utf-8") as file:
-        writer = csv.writer(file, delimiter="\t")
-        writer.writerow(["user_id", "channel", "video", "comments"])
-
-        if not export_videos:
-            for user, channels in stat.items():
-                for channel, videos in channels.items():
-                    total_channel_count = sum(videos.values())
-                    writer.writerow([user, channel, "", total_channel_count])
-        else:
-            for user, channels in stat.items():
-                for channel, videos in channels.items():
-                    for video, count in videos.items():
-                        writer.writerow([user, channel, video, count])
+    header = ["user_id", "channel", "video", "comments"]
+    rows = _statistics_rows(stat, export_videos)
+    if authors_info is not None:
+        header += ["registration_date", "subscribers", "videos"]
+        rows = _with_authors_info(rows, authors_info)
+    export_rows(rows, path, header)
 
 
 # Просто список комментариев по каждому пользователю
@@ -119,9 +147,32 @@ def export_comments_text_statistics(stat: CommentsTextStatistics, path: str):
     :param path:
     :return:
     """
-    with open(path, "w", encoding="utf-8") as file:
-        writer = csv.writer(file, delimiter="\t")
-        writer.writerow(["user_id", "comment"])
-        for user, comments in stat.items():
-            for comment in comments:
-                writer.writerow([user, comment])
+    export_rows(
+        ((user, comment) for user, comments in stat.items() for comment in comments),
+        path,
+        ["user_id", "comment"],
+    )
+
+
+class CommentsTextWriter:
+    def __init__(self, path: str):
+        """
+        Записывает тексты комментариев в файл по мере их скачивания, не держа их в памяти.
+        Формат файла тот же, что у export_comments_text_statistics, но комментарии не сгруппированы по
+        пользователям
+        :param path: файл таблицы (сжатие и формат выбираются по расширению, см. ExportWriter)
+        """
+        self._writer = ExportWriter(path, ["user_id", "comment"])
+
+    def __enter__(self):
+        self._writer.__enter__()
+        return self
+
+    def add(self, comment: Comment):
+        """
+        Записать комментарий
+        """
+        self._writer.write((comment.author, comment.comment))
+
+    def __exit__(self, *args):
+        self._writer.__exit__(*args)
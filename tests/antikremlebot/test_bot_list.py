@@ -0,0 +1,58 @@
+import asyncio
+
+from aiohttp import ClientConnectionError
+
+from antikremlebot import AntiIraApi
+
+BOT_LIST = "UCaaa=2020-01-01\nUCbbb=2020-02-02\n"
+
+
+class FakeResponse:
+    def __init__(self, status: int, text: str = "", headers=None):
+        self.status = status
+        self._text = text
+        self.headers = headers or {}
+
+    async def text(self) -> str:
+        return self._text
+
+    def raise_for_status(self):
+        assert self.status < 400
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.requests = []
+        self.offline = False
+
+    def get(self, link, headers=None):
+        self.requests.append(headers)
+        if self.offline:
+            raise ClientConnectionError()
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(200, BOT_LIST, {"ETag": '"v1"'})
+
+
+def test_bot_list_is_revalidated_and_works_offline(tmp_path):
+    cache_path = str(tmp_path / "bots.pickle")
+    session = FakeSession()
+
+    bots = asyncio.run(AntiIraApi(session, cache_path).get_bot_list(["SMM"]))
+    assert [bot.user for bot in bots] == ["UCaaa", "UCbbb"]
+
+    # Второй запуск: список не изменился, сервер отвечает 304 и берётся сохранённый список
+    ids = asyncio.run(AntiIraApi(session, cache_path).get_bot_ids(["SMM"]))
+    assert session.requests[-1] == {"If-None-Match": '"v1"'}
+    assert ids == {"UCaaa", "UCbbb"}
+
+    # Без сети используется последний скачанный список
+    session.offline = True
+    ids = asyncio.run(AntiIraApi(session, cache_path).get_bot_ids(["SMM"]))
+    assert ids == {"UCaaa", "UCbbb"}
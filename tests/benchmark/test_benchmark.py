@@ -0,0 +1,50 @@
+import asyncio
+
+from benchmark import FakeConfig
+from benchmark.__main__ import run
+from benchmark.fake_api import parse_fields, select_fields
+
+
+def test_crawl_against_fake_api():
+    config = FakeConfig(channels=2, videos=3, threads=120, replies=7)
+
+    result = asyncio.run(run(config, uploads=True, reply_parallel=4))
+
+    assert result["comments"] == 2 * 3 * 120 * (1 + 7)
+    # Две страницы веток на видео и одна страница ответов на каждую ветку
+    assert result["quota_by_endpoint"]["commentThreads"] == 2 * 3 * 2
+    assert result["quota_by_endpoint"]["comments"] == 2 * 3 * 120
+
+
+def test_injected_errors_are_retried():
+    config = FakeConfig(channels=1, videos=2, threads=50, replies=7, errors=0.05)
+
+    result = asyncio.run(run(config, uploads=True, reply_parallel=4))
+
+    assert result["comments"] == 2 * 50 * (1 + 7)
+    assert result["retries"] == result["injected_errors"]
+
+
+def test_partial_response_fields():
+    fields = parse_fields("nextPageToken,items(id,snippet(a,b(c)))")
+    assert fields == {
+        "nextPageToken": {},
+        "items": {"id": {}, "snippet": {"a": {}, "b": {"c": {}}}},
+    }
+    data = {
+        "kind": "k",
+        "items": [{"id": "1", "snippet": {"a": 1, "b": {"c": 2, "d": 3}}}],
+    }
+    assert select_fields(data, fields) == {
+        "items": [{"id": "1", "snippet": {"a": 1, "b": {"c": 2}}}]
+    }
+
+
+def test_without_text_responses_are_smaller():
+    config = FakeConfig(channels=1, videos=2, threads=30, replies=7)
+
+    full = asyncio.run(run(config, uploads=False, reply_parallel=4))
+    lean = asyncio.run(run(config, uploads=False, reply_parallel=4, with_text=False))
+
+    assert lean["comments"] == full["comments"] == 2 * 30 * (1 + 7)
+    assert lean["response_bytes"] < full["response_bytes"]
@@ -0,0 +1,105 @@
+import random
+from statistics import CompactStatistics, export_statistics
+
+import pytest
+
+from youtube import Comment
+
+
+def random_comments(count: int):
+    rnd = random.Random(42)
+    for i in range(count):
+        channel = "channel" + str(rnd.randrange(5))
+        yield Comment(
+            channel,
+            channel + "_video" + str(rnd.randrange(4)),
+            "user" + str(rnd.randrange(30)),
+            "text",
+            str(i),
+        )
+
+
+def nested_statistics(comments, ignore_users=None, use_only_users=None):
+    """
+    Прежний алгоритм get_statistics на вложенных словарях, с которым сверяется CompactStatistics
+    """
+    stat = {}
+    for comment in comments:
+        if ignore_users and comment.author in ignore_users:
+            continue
+        if use_only_users and comment.author not in use_only_users:
+            continue
+        if comment.author == comment.channel:
+            continue
+        videos = stat.setdefault(comment.author, {}).setdefault(comment.channel, {})
+        videos[comment.video] = videos.get(comment.video, 0) + 1
+    return stat
+
+
+def test_statistics_view_matches_nested_dicts():
+    comments = list(random_comments(2000))
+    compact = CompactStatistics(use_only_users=["user1", "user2", "user3"])
+    for comment in comments:
+        compact.add(comment)
+
+    assert compact.statistics == nested_statistics(
+        comments, use_only_users=["user1", "user2", "user3"]
+    )
+
+
+@pytest.mark.parametrize("export_videos", [False, True])
+def test_export_matches_nested_dicts(tmp_path, export_videos):
+    comments = list(random_comments(2000))
+    compact = CompactStatistics()
+    for comment in comments:
+        compact.add(comment)
+
+    export_statistics(compact, str(tmp_path / "compact.csv"), export_videos)
+    export_statistics(
+        nested_statistics(comments), str(tmp_path / "dict.csv"), export_videos
+    )
+
+    assert (tmp_path / "compact.csv").read_text() == (tmp_path / "dict.csv").read_text()
+
+
+def test_interned_ids():
+    compact = CompactStatistics()
+    compact.add(Comment("channel", "video", "user", "text", "1"))
+    compact.add(Comment("channel", "video", "user", "text", "2"))
+
+    assert len(compact) == 1
+    assert compact.users.values == ["user"]
+    assert list(compact.rows()) == [("user", "channel", "video", 2)]
+
+
+def test_snapshot_roundtrip(tmp_path):
+    compact = CompactStatistics()
+    for comment in random_comments(500):
+        compact.add(comment)
+
+    compact.save(str(tmp_path / "stat.snap"))
+    loaded = CompactStatistics.load(str(tmp_path / "stat.snap"))
+
+    assert loaded.statistics == compact.statistics
+    # Индекс строк восстановлен: существующая строка не дублируется
+    user, channel, video, _ = next(compact.rows())
+    loaded.add(Comment(channel, video, user, "text", "x"))
+    assert len(loaded) == len(compact)
+
+
+def test_merge_and_diff():
+    first = CompactStatistics()
+    first.add(Comment("channel", "video1", "user1", "text", "1"))
+    first.add(Comment("channel", "video1", "user2", "text", "2"))
+    second = CompactStatistics()
+    second.add(Comment("channel", "video1", "user1", "text", "3"))
+    second.add(Comment("channel", "video2", "user3", "text", "4"))
+
+    merged = CompactStatistics.merged([first, second])
+
+    assert merged.statistics == {
+        "user1": {"channel": {"video1": 2}},
+        "user2": {"channel": {"video1": 1}},
+        "user3": {"channel": {"video2": 1}},
+    }
+    assert CompactStatistics.diff(first, merged).statistics == second.statistics
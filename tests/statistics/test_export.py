@@ -0,0 +1,29 @@
+import gzip
+import json
+import lzma
+from statistics import ExportWriter, export_rows
+
+
+def test_compressed_export(tmp_path):
+    path = str(tmp_path / "table.csv.gz")
+    export_rows(([str(i), i] for i in range(1000)), path, ["name", "count"])
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines[0] == "name\tcount"
+    assert lines[1] == "0\t0"
+    assert len(lines) == 1001
+
+
+def test_ndjson_export_is_written_progressively(tmp_path):
+    path = str(tmp_path / "table.ndjson.xz")
+    with ExportWriter(path, ["user_id", "comment"], buffer_size=10) as writer:
+        writer.write(("u1", "привет"))
+        writer.write(("u2", "текст"))
+
+    with lzma.open(path, "rt", encoding="utf-8") as file:
+        rows = [json.loads(line) for line in file]
+    assert rows == [
+        {"user_id": "u1", "comment": "привет"},
+        {"user_id": "u2", "comment": "текст"},
+    ]
@@ -1,11 +1,13 @@
 import inspect
 import logging
-from statistics import export_statistics, get_statistics
+from datetime import datetime
+from statistics import (CommentsTextWriter, CompactStatistics,
+                        export_statistics, get_statistics)
 
 import pytest
 import pytest_mock
 
-from youtube import Comment
+from youtube import ChannelInfo, Comment
 
 comments = [
     Comment(
@@ -71,6 +73,13 @@ def test_ignore_comments_of_not_specified_users():
     assert list(stats.keys())[0] == "UCSTJ4D8krCXQLq3_-V9ZYWg"
 
 
+def written(mocked_file) -> str:
+    """
+    Всё, что было записано в подменённый файл (экспорт пишет строки большими кусками)
+    """
+    return "".join(call.args[0] for call in mocked_file().write.call_args_list)
+
+
 def test_export_to_csv(mocker):
     stats = get_statistics(comments, [])
 
@@ -78,10 +87,51 @@ def test_export_to_csv(mocker):
     export_statistics(stats, "fake.csv")
 
     mocked_file.assert_called_with("fake.csv", "w", encoding="utf-8")
-    mocked_file().write.assert_any_call("user_id\tchannel\tvideo\tcomments\r\n")
-    mocked_file().write.assert_any_call(
-        "UCv3WZQIAXeprUopgMDWLvmQ\tUC5DqQh9__HKLd_HpDAXxsVw\t\t2\r\n"
+    text = written(mocked_file)
+    assert "user_id\tchannel\tvideo\tcomments\r\n" in text
+    assert "UCv3WZQIAXeprUopgMDWLvmQ\tUC5DqQh9__HKLd_HpDAXxsVw\t\t2\r\n" in text
+    assert "UCSTJ4D8krCXQLq3_-V9ZYWg\tUC5DqQh9__HKLd_HpDAXxsVw\t\t1\r\n" in text
+
+
+def test_export_authors_info(mocker):
+    stats = get_statistics(comments, [])
+    info = ChannelInfo(
+        "UCv3WZQIAXeprUopgMDWLvmQ", datetime(2015, 3, 4), 7, "title", 100, 1000
+    )
+
+    mocked_file = mocker.patch("builtins.open", mocker.mock_open())
+    export_statistics(
+        stats, "fake.csv", authors_info={"UCv3WZQIAXeprUopgMDWLvmQ": info}
+    )
+
+    text = written(mocked_file)
+    assert (
+        "user_id\tchannel\tvideo\tcomments\tregistration_date\tsubscribers\tvideos\r\n"
+        in text
     )
-    mocked_file().write.assert_any_call(
-        "UCSTJ4D8krCXQLq3_-V9ZYWg\tUC5DqQh9__HKLd_HpDAXxsVw\t\t1\r\n"
+    assert (
+        "UCv3WZQIAXeprUopgMDWLvmQ\tUC5DqQh9__HKLd_HpDAXxsVw\t\t2\t2015-03-04\t100\t7\r\n"
+        in text
     )
+    assert "UCSTJ4D8krCXQLq3_-V9ZYWg\tUC5DqQh9__HKLd_HpDAXxsVw\t\t1\t\t\t\r\n" in text
+
+
+def test_compact_statistics():
+    compact = CompactStatistics(ignore_users=["UCSTJ4D8krCXQLq3_-V9ZYWg"])
+    for comment in comments:
+        compact.add(comment)
+
+    assert compact.statistics == {
+        "UCv3WZQIAXeprUopgMDWLvmQ": {"UC5DqQh9__HKLd_HpDAXxsVw": {"verpkNic3SM": 2}}
+    }
+
+
+def test_comments_text_writer(mocker):
+    mocked_file = mocker.patch("builtins.open", mocker.mock_open())
+    with CommentsTextWriter("fake.csv") as writer:
+        writer.add(comments[0])
+
+    mocked_file.assert_called_with("fake.csv", "w", encoding="utf-8")
+    text = written(mocked_file)
+    assert "user_id\tcomment\r\n" in text
+    assert "UCv3WZQIAXeprUopgMDWLvmQ\tcomment 1_1\r\n" in text
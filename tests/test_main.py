@@ -0,0 +1,63 @@
+import asyncio
+import subprocess
+import sys
+from datetime import date
+from os.path import dirname
+
+import pytest
+
+from main import main, parse_args, pipe_comments
+from youtube import NoWorkingKeys
+
+
+def test_headless_arguments():
+    args = parse_args(
+        ["--date", "2021-01-01", "--key", "a,b", "--bots", "SMM", "--only-bots"]
+    )
+
+    assert args.date == date(2021, 1, 1)
+    assert args.key == "a,b"
+    assert args.bots == ["SMM"]
+    assert args.only_bots
+    assert not args.videos
+
+
+def test_gui_is_not_imported_without_window():
+    code = "import sys, main; print('tkinter' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=dirname(dirname(__file__)),
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_failing_consumer_stops_producers():
+    queue = asyncio.Queue(maxsize=10)
+    cancelled = []
+
+    async def produce():
+        try:
+            for number in range(1000):
+                await queue.put(number)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    def fail(comment):
+        if comment == 5:
+            raise OSError("disk full")
+
+    async def run():
+        await asyncio.wait_for(pipe_comments([produce()], queue, [fail]), 5)
+
+    with pytest.raises(OSError):
+        asyncio.run(run())
+    assert cancelled
+
+
+def test_empty_key_list_is_an_error():
+    with pytest.raises(NoWorkingKeys):
+        asyncio.run(main(" , ", date(2021, 1, 1), [], True))
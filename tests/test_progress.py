@@ -0,0 +1,40 @@
+from progress import Progress
+from youtube import QuotaScheduler
+
+
+def test_counters_and_listeners():
+    progress = Progress()
+    changes = []
+    progress.subscribe(lambda: changes.append(progress.stage))
+
+    scheduler = QuotaScheduler(1000)
+    progress.start(scheduler)
+    progress.channels(2)
+    progress.channel_done()
+    progress.channel_done()
+    progress.videos(4)
+    for _ in range(3):
+        progress.comment_added()
+    progress.video_done()
+
+    assert progress.channels_done == progress.channels_total == 2
+    assert progress.videos_done == 1
+    assert progress.comments == 3
+    assert progress.quota_budget == 1000
+    assert progress.eta is not None
+    assert len(changes) == 9
+    assert "Видео: 1 из 4" in str(progress)
+
+    progress.finish()
+    assert progress.finished
+    assert changes[-1] == "Готово"
+
+
+def test_eta_unknown_before_first_video():
+    progress = Progress()
+    progress.start()
+    progress.videos(10)
+
+    assert progress.eta is None
+    assert progress.quota_spent == 0
+    assert "Квота" not in str(progress)
@@ -0,0 +1,97 @@
+"""
+Подмена aiohttp сессии для тестов YouTubeApi без обращения к сети
+"""
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+
+class FakeResponse:
+    status = 200
+    reason = "OK"
+
+    def __init__(self, session: "FakeSession", data: Dict):
+        self._session = session
+        self._data = data
+
+    async def json(self) -> Dict:
+        return self._data
+
+    async def __aenter__(self):
+        self._session.in_flight += 1
+        self._session.max_in_flight = max(
+            self._session.max_in_flight, self._session.in_flight
+        )
+        try:
+            await asyncio.sleep(self._session.delay)
+        finally:
+            self._session.in_flight -= 1
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeSession:
+    def __init__(self, handler: Callable[[str, Dict], Dict], delay: float = 0):
+        """
+        :param handler: функция (метод API, параметры) -> json ответа
+        :param delay: задержка ответа в секундах
+        """
+        self._handler = handler
+        self.delay = delay
+        self.calls: List = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, link: str, params: Optional[Dict] = None, **kwargs):
+        endpoint = link.rsplit("/", 1)[-1]
+        self.calls.append((endpoint, dict(params or {})))
+        return FakeResponse(self, self._handler(endpoint, params or {}))
+
+
+def thread(id: str, published: str, replies: List[Dict]) -> Dict:
+    """
+    JSON объект ветки комментариев
+    """
+    return {
+        "kind": "youtube#commentThread",
+        "id": id,
+        "snippet": {
+            "totalReplyCount": len(replies),
+            "topLevelComment": {
+                "snippet": {
+                    "authorChannelId": {"value": "author_" + id},
+                    "textOriginal": "text " + id,
+                    "publishedAt": published,
+                }
+            },
+        },
+        "replies": {"comments": replies[:5]},
+    }
+
+
+def reply(id: str, published: str) -> Dict:
+    """
+    JSON объект ответа на комментарий
+    """
+    return {
+        "kind": "youtube#comment",
+        "id": id,
+        "snippet": {
+            "authorChannelId": {"value": "author_" + id},
+            "textOriginal": "text " + id,
+            "publishedAt": published,
+        },
+    }
+
+
+def paged(items: List[Dict], params: Dict, size: int) -> Dict:
+    """
+    Отдать страницу из списка объектов, как это делает API
+    """
+    start = int(params.get("pageToken", 0))
+    data = {"items": items[start : start + size]}
+    if start + size < len(items):
+        data["nextPageToken"] = str(start + size)
+    return data
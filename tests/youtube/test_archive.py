@@ -0,0 +1,87 @@
+import sqlite3
+from datetime import datetime
+from statistics import get_statistics
+
+from youtube import Comment, CommentArchive
+
+
+def test_archive_stores_and_queries_comments(tmp_path):
+    path = str(tmp_path / "archive.sqlite")
+    with CommentArchive(path, batch_size=2) as archive:
+        archive.add(Comment("c1", "v1", "u1", "first", "1"))
+        archive.add(Comment("c1", "v1", "u2", "second", "2"))
+        archive.add(Comment("c2", "v2", "u1", "third", "3"))
+        # Повторно скачанный комментарий не дублируется
+        archive.add(Comment("c1", "v1", "u1", "first, edited", "1"))
+
+        assert len(archive) == 3
+        texts = sorted(comment.comment for comment in archive.comments(author="u1"))
+        assert texts == ["first, edited", "third"]
+        assert [comment.id for comment in archive.comments(channel="c2")] == ["3"]
+
+    # Статистика пересобирается из архива без обращения к API
+    with CommentArchive(path) as archive:
+        stat = get_statistics(archive.comments(), ignore_users=["u2"])
+    assert stat == {"u1": {"c1": {"v1": 1}, "c2": {"v2": 1}}}
+
+
+def test_old_archive_gets_date_columns(tmp_path):
+    path = str(tmp_path / "archive.sqlite")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE comments (id TEXT PRIMARY KEY, author TEXT, channel TEXT, video TEXT, comment TEXT, "
+        "fetched_at TEXT)"
+    )
+    db.execute("INSERT INTO comments VALUES ('1', 'u1', 'c1', 'v1', 'old', '2021')")
+    db.commit()
+    db.close()
+
+    published = datetime(2021, 1, 2, 3, 4, 5)
+    with CommentArchive(path) as archive:
+        archive.add(Comment("c1", "v1", "u2", "new", "2", published=published))
+        comments = {comment.id: comment for comment in archive.comments()}
+
+    assert comments["1"].published is None
+    assert comments["2"].published == published
+    assert comments["2"].updated is None
+
+
+def test_since_filters_by_publication_date(tmp_path):
+    path = str(tmp_path / "archive.sqlite")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE comments (id TEXT PRIMARY KEY, author TEXT, channel TEXT, video TEXT, comment TEXT, "
+        "fetched_at TEXT)"
+    )
+    # Старая запись без даты публикации, скачанная в 2021 году
+    db.execute(
+        "INSERT INTO comments VALUES ('1', 'u1', 'c1', 'v1', 'legacy', '2021-06-01T00:00:00')"
+    )
+    db.commit()
+    db.close()
+
+    with CommentArchive(path) as archive:
+        # Скачаны сейчас, но оставлены давно и недавно
+        archive.add(
+            Comment("c1", "v1", "u1", "old", "2", published=datetime(2019, 1, 1))
+        )
+        archive.add(
+            Comment("c1", "v1", "u1", "new", "3", published=datetime(2021, 1, 1))
+        )
+
+        def ids(since):
+            return sorted(c.id for c in archive.comments(author="u1", since=since))
+
+        assert ids(datetime(2020, 1, 1)) == ["1", "3"]
+        assert ids(datetime(2021, 3, 1)) == ["1"]
+        assert ids(datetime(2018, 1, 1)) == ["1", "2", "3"]
+
+        plan = " ".join(
+            row[-1]
+            for row in archive._db.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM comments "
+                "WHERE author = ? AND COALESCE(published, fetched_at) >= ?",
+                ("u1", "2020"),
+            )
+        )
+        assert "comments_author_posted" in plan
@@ -0,0 +1,60 @@
+import asyncio
+
+from tests.youtube.fake_session import FakeSession, paged
+from tests.youtube.test_comments import REPLIES, THREADS
+from youtube import CommentBudget, YouTubeApi
+
+
+def handler(endpoint, params):
+    # В отличие от test_comments, размер страницы зависит от maxResults
+    if endpoint == "commentThreads":
+        return paged(THREADS, params, min(params["maxResults"], 10))
+    return paged(REPLIES[params["parentId"]], params, min(params["maxResults"], 4))
+
+
+def test_video_limit_is_exact():
+    session = FakeSession(handler)
+    api = YouTubeApi("key", session)
+
+    comments = asyncio.run(api.list_comments_full_list("video", "channel", limit=15))
+
+    assert len(comments) == 15
+    # t0 и 10 его ответов, затем t1 и три ответа из пришедших вместе с веткой
+    assert comments[-1].id == "t1_r2"
+    assert session.calls[0][1]["maxResults"] == 15
+    # Ответы на t1 не загружаются отдельно: бюджета хватает только на пришедшие с веткой
+    assert [params["parentId"] for _, params in session.calls[1:]] == ["t0"] * 3
+
+
+def test_nearly_spent_budget_skips_reply_expansion():
+    session = FakeSession(handler)
+    api = YouTubeApi("key", session)
+
+    comments = asyncio.run(api.list_comments_full_list("video", "channel", limit=3))
+
+    assert [comment.id for comment in comments] == ["t0", "t0_r0", "t0_r1"]
+    assert [endpoint for endpoint, _ in session.calls] == ["commentThreads"]
+
+
+def test_channel_and_total_budgets():
+    budget = CommentBudget(total=50, per_channel=30)
+    api = YouTubeApi("key", FakeSession(handler))
+
+    async def fetch(video: str, channel: str):
+        return [c async for c in api.list_comments(video, channel, budget=budget)]
+
+    assert len(asyncio.run(fetch("v1", "c1"))) == 30
+    assert asyncio.run(fetch("v2", "c1")) == []
+    assert len(asyncio.run(fetch("v3", "c2"))) == 20
+    assert budget.spent == 50
+    assert budget.exhausted
+
+
+def test_budget_remaining():
+    budget = CommentBudget(per_video=2)
+    assert budget.remaining("channel", "video") == 2
+    assert budget.take("channel", "video")
+    assert budget.take("channel", "video")
+    assert not budget.take("channel", "video")
+    assert budget.remaining("channel", "other") == 2
+    assert CommentBudget().remaining("channel", "video") is None
@@ -0,0 +1,74 @@
+import sqlite3
+
+from youtube import ResponseCache
+from youtube.cache import CACHE_COMMIT_EVERY
+
+
+def test_key_ignores_api_key_and_param_order():
+    first = ResponseCache.make_key(
+        "commentThreads", {"key": "AAA", "videoId": "v1", "part": "snippet, id"}
+    )
+    second = ResponseCache.make_key(
+        "commentThreads", {"part": "snippet,id", "videoId": "v1", "key": "BBB"}
+    )
+
+    assert first == second
+    assert "AAA" not in first
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    params = {"id": "v1", "part": "snippet"}
+
+    assert cache.get("videos", params) is None
+    cache.put("videos", params, {"items": [{"id": "v1"}]})
+
+    assert cache.get("videos", params) == {"items": [{"id": "v1"}]}
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl={"videos": -1})
+    cache.put("videos", {"id": "v1"}, {"items": []})
+
+    assert cache.get("videos", {"id": "v1"}) is None
+
+
+def test_entries_survive_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.put("search", {"channelId": "c1"}, {"items": []})
+    cache.close()
+
+    assert ResponseCache(path).get("search", {"channelId": "c1"}) == {"items": []}
+
+
+def test_eviction_keeps_cache_under_max_size(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_size=2000)
+    for i in range(100):
+        cache.put("videos", {"id": str(i)}, {"items": [{"id": str(i) * 50}]})
+
+    assert cache.size <= 2000
+    assert cache.get("videos", {"id": "99"}) is not None
+    assert cache.get("videos", {"id": "0"}) is None
+
+
+def test_changes_are_committed_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    reader = sqlite3.connect(path)
+
+    def stored():
+        return reader.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    cache.put("videos", {"id": "v1"}, {"items": []})
+    assert cache.get("videos", {"id": "v1"}) == {"items": []}
+    assert stored() == 0
+
+    for i in range(CACHE_COMMIT_EVERY):
+        cache.put("videos", {"id": str(i)}, {"items": []})
+    assert stored() > 0
+
+    cache.close()
+    assert stored() == CACHE_COMMIT_EVERY + 1
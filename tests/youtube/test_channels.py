@@ -0,0 +1,52 @@
+import asyncio
+
+from tests.youtube.fake_session import FakeSession
+from youtube import ResponseCache, YouTubeApi
+
+
+def channels_handler(endpoint, params):
+    assert endpoint == "channels"
+    ids = params["id"].split(",")
+    assert len(ids) <= 50
+    return {
+        "items": [
+            {
+                "id": code,
+                "snippet": {"title": code, "publishedAt": "2020-01-02T03:04:05Z"},
+                "statistics": {"videoCount": "1", "viewCount": "2"},
+            }
+            for code in ids
+            if code != "deleted"
+        ]
+    }
+
+
+def test_channels_are_batched_and_reused():
+    session = FakeSession(channels_handler)
+    api = YouTubeApi("key", session)
+    channels = ["c" + str(i) for i in range(60)] + ["deleted", "c0"]
+
+    info = asyncio.run(api.get_channels_info(channels))
+
+    assert len(info) == 60
+    assert "deleted" not in info
+    assert info["c5"].registration_date.year == 2020
+    assert len(session.calls) == 2
+
+    # Повторный запрос тех же каналов берётся из памяти
+    asyncio.run(api.get_channels_info(["c1", "c2"]))
+    assert len(session.calls) == 2
+
+
+def test_channels_are_cached_per_id(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    session = FakeSession(channels_handler)
+    asyncio.run(YouTubeApi("key", session, cache=cache).get_channels_info(["a", "b"]))
+
+    session = FakeSession(channels_handler)
+    api = YouTubeApi("key", session, cache=cache)
+    info = asyncio.run(api.get_channels_info(["b", "c"]))
+
+    assert set(info) == {"b", "c"}
+    assert [params["id"] for _, params in session.calls] == ["c"]
+    cache.close()
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+
+from tests.youtube.fake_session import FakeSession, paged, reply, thread
+from youtube import YouTubeApi
+
+# У каждой ветки 10 ответов, а вместе с веткой приходят только 5, остальные нужно загружать отдельно
+REPLIES = {
+    "t%d" % i: [reply("t%d_r%d" % (i, j), "2021-01-02T00:00:00Z") for j in range(10)]
+    for i in range(20)
+}
+THREADS = [
+    thread(id, "2021-01-01T00:00:00Z", replies) for id, replies in REPLIES.items()
+]
+
+
+def handler(endpoint, params):
+    if endpoint == "commentThreads":
+        return paged(THREADS, params, 10)
+    assert endpoint == "comments"
+    return paged(REPLIES[params["parentId"]], params, 4)
+
+
+def fetch(api: YouTubeApi):
+    async def collect():
+        return [c.id async for c in api.list_comments("video", "channel")]
+
+    return asyncio.run(collect())
+
+
+def test_replies_follow_their_thread():
+    ids = fetch(YouTubeApi("key", FakeSession(handler)))
+
+    assert len(ids) == 20 * 11
+    assert ids[:3] == ["t0", "t0_r0", "t0_r1"]
+    assert ids.index("t1") == 11
+
+
+def test_reply_threads_are_fetched_concurrently():
+    session = FakeSession(handler, delay=0.01)
+    fetch(YouTubeApi("key", session, reply_parallel=4))
+
+    # Четыре ветки ответов и следующая страница веток
+    assert session.max_in_flight == 5
+
+
+def test_early_close_cancels_pending_requests():
+    session = FakeSession(handler, delay=0.01)
+    api = YouTubeApi("key", session)
+
+    async def first():
+        comments = api.list_comments("video", "channel")
+        comment = await comments.__anext__()
+        await comments.aclose()
+        await asyncio.sleep(0.05)
+        return comment
+
+    assert asyncio.run(first()).id == "t0"
+    assert session.in_flight == 0
+
+
+def test_authors_filter_drops_other_comments():
+    api = YouTubeApi("key", FakeSession(handler))
+    authors = {"author_t3", "author_t5_r7"}
+
+    comments = asyncio.run(
+        api.list_comments_full_list("video", "channel", authors=authors)
+    )
+
+    assert [comment.id for comment in comments] == ["t3", "t5_r7"]
+    assert api.skipped_comments == 20 * 11 - 2
+
+
+def test_since_stops_paging_at_older_threads():
+    threads = [
+        thread("t%d" % i, "2021-01-%02dT12:00:00Z" % (20 - i), []) for i in range(20)
+    ]
+    session = FakeSession(lambda endpoint, params: paged(threads, params, 5))
+    api = YouTubeApi("key", session)
+
+    async def collect():
+        since = datetime(2021, 1, 15)
+        return [c async for c in api.list_comments("video", "channel", since=since)]
+
+    comments = asyncio.run(collect())
+
+    assert [comment.id for comment in comments] == ["t%d" % i for i in range(6)]
+    assert comments[0].published == datetime(2021, 1, 20, 12)
+    assert len(session.calls) == 2
+    assert session.calls[0][1]["order"] == "time"
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from tests.youtube.fake_session import FakeSession
+from youtube import (KeyPool, NoWorkingKeys, QuotaExhausted, QuotaScheduler,
+                     YouTubeApi)
+
+QUOTA_EXCEEDED = {
+    "error": {
+        "code": 403,
+        "message": "The request cannot be completed because you have exceeded your quota.",
+        "errors": [{"reason": "quotaExceeded"}],
+    }
+}
+
+KEY_INVALID = {
+    "error": {
+        "code": 400,
+        "message": "API key not valid. Please pass a valid API key.",
+        "errors": [{"reason": "keyInvalid"}],
+    }
+}
+
+
+def handler(exhausted_keys):
+    def handle(endpoint, params):
+        if params["key"] in exhausted_keys:
+            return QUOTA_EXCEEDED
+        return {"items": []}
+
+    return handle
+
+
+def test_exhausted_key_is_rotated_out():
+    session = FakeSession(handler({"first"}))
+    keys = KeyPool(["first", "second"])
+    api = YouTubeApi(keys, session)
+
+    asyncio.run(api.list_videos_by_channel("c1"))
+    asyncio.run(api.list_videos_by_channel("c2"))
+
+    used = [params["key"] for _, params in session.calls]
+    assert used == ["first", "second", "second"]
+
+
+def test_all_keys_exhausted():
+    api = YouTubeApi(
+        KeyPool(["first", "second"]), FakeSession(handler({"first", "second"}))
+    )
+
+    with pytest.raises(QuotaExhausted):
+        asyncio.run(api.list_videos_by_channel("c1"))
+
+
+def test_requests_are_spread_by_spent_quota():
+    keys = KeyPool(["first", "second"], budget=150)
+
+    assert [keys.acquire(100), keys.acquire(1), keys.acquire(1)] == [
+        "first",
+        "second",
+        "second",
+    ]
+    assert keys.acquire(40) == "second"
+    with pytest.raises(QuotaExhausted):
+        keys.acquire(110)
+
+
+def test_invalid_keys_are_not_exhausted_quota():
+    scheduler = QuotaScheduler(100)
+    api = YouTubeApi(
+        KeyPool(["first", "second"]),
+        FakeSession(lambda endpoint, params: KEY_INVALID),
+        scheduler=scheduler,
+    )
+
+    with pytest.raises(NoWorkingKeys):
+        asyncio.run(api.list_videos_by_ids(["v1"]))
+    assert scheduler.remaining > 0
+
+
+def test_exhausted_and_invalid_keys_mean_exhausted_quota():
+    keys = KeyPool(["first", "second"])
+    keys.exhaust("first")
+    keys.disable("second")
+
+    with pytest.raises(QuotaExhausted):
+        keys.acquire()
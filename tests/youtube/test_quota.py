@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from youtube import QuotaExhausted, QuotaScheduler
+
+
+def test_costs_are_charged_per_endpoint():
+    async def run():
+        scheduler = QuotaScheduler(1000)
+        async with scheduler.slot("search"):
+            pass
+        async with scheduler.slot("commentThreads"):
+            pass
+        return scheduler
+
+    scheduler = asyncio.run(run())
+
+    assert scheduler.spent == 101
+    assert scheduler.stat == {"search": 100, "commentThreads": 1}
+
+
+def test_budget_exhaustion_raises():
+    async def run():
+        scheduler = QuotaScheduler(150)
+        async with scheduler.slot("search"):
+            pass
+        async with scheduler.slot("search"):
+            pass
+
+    with pytest.raises(QuotaExhausted):
+        asyncio.run(run())
+
+
+def test_waiting_requests_are_admitted_by_priority():
+    order = []
+
+    async def request(scheduler, endpoint, name):
+        async with scheduler.slot(endpoint):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        scheduler = QuotaScheduler(1000, concurrency=1)
+        await asyncio.gather(
+            request(scheduler, "comments", "first"),
+            request(scheduler, "comments", "reply"),
+            request(scheduler, "commentThreads", "thread"),
+            request(scheduler, "search", "search"),
+        )
+
+    asyncio.run(run())
+
+    assert order == ["first", "search", "thread", "reply"]
+
+
+def test_spent_quota_is_shared_between_runs(tmp_path):
+    path = str(tmp_path / "quota.json")
+    scheduler = QuotaScheduler(1000, state_path=path)
+    scheduler.exhaust()
+    scheduler.save()
+
+    assert QuotaScheduler(1000, state_path=path).remaining == 0
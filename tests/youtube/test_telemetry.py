@@ -0,0 +1,51 @@
+import asyncio
+
+from aiohttp import ClientSession, web
+
+from benchmark import FakeConfig, FakeYouTube, make_app
+from youtube import Telemetry, YouTubeApi
+
+
+async def crawl(telemetry: Telemetry):
+    fake = FakeYouTube(FakeConfig(channels=1, videos=2, threads=150, replies=7))
+    runner = web.AppRunner(make_app(fake))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        async with ClientSession(trace_configs=[telemetry.trace_config()]) as session:
+            api = YouTubeApi(
+                "key",
+                session,
+                api_url="http://" + host + ":" + str(port) + "/youtube/v3/",
+            )
+            channel = fake.channel_ids[0]
+            for video in await api.list_videos_by_channel(channel):
+                async for _ in api.list_comments(video.code, video.channel):
+                    pass
+    finally:
+        await runner.cleanup()
+
+
+def test_requests_are_grouped_by_endpoint_and_video(tmp_path):
+    telemetry = Telemetry()
+    asyncio.run(crawl(telemetry))
+
+    summary = telemetry.summary()
+    assert summary["endpoints"]["search"]["quota"] == 100
+    assert summary["endpoints"]["commentThreads"]["requests"] == 4
+    assert summary["endpoints"]["comments"]["requests"] == 300
+    assert summary["endpoints"]["comments"]["bytes"] > 0
+    assert summary["pages_per_video"] == {"videos": 2, "max": 2, "mean": 2}
+    # Ответы на комментарии тоже учитываются для своего видео и канала
+    assert summary["top_videos"][0]["requests"] == 152
+    assert summary["top_channels"][0]["requests"] == 1 + 2 * 152
+
+    telemetry.save(str(tmp_path / "telemetry"))
+    text = (tmp_path / "telemetry.prom").read_text()
+    assert 'youtube_api_requests_total{endpoint="comments"} 300' in text
+    assert (
+        'youtube_api_request_duration_seconds_bucket{endpoint="search",le="+Inf"} 1'
+        in text
+    )
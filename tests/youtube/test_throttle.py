@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from tests.youtube.fake_session import FakeSession
+from youtube import AdaptiveLimiter, YouTubeApi, YouTubeError
+
+
+def test_limit_grows_additively_and_drops_multiplicatively():
+    async def run():
+        limiter = AdaptiveLimiter(initial=4, maximum=10)
+        for _ in range(5):
+            limiter.release(await limiter.acquire())
+        grown = limiter.limit
+
+        # Несколько одновременных отказов уменьшают лимит только один раз
+        epochs = [await limiter.acquire() for _ in range(4)]
+        for epoch in epochs:
+            limiter.release(epoch, throttled=True)
+        return grown, limiter
+
+    grown, limiter = asyncio.run(run())
+
+    assert grown == 5
+    assert limiter.limit == 2
+    assert limiter.throttled == 4
+
+
+def rate_limited(failures: int):
+    calls = []
+
+    def handler(endpoint, params):
+        calls.append(endpoint)
+        if len(calls) <= failures:
+            return {
+                "error": {
+                    "code": 403,
+                    "message": "Rate Limit Exceeded",
+                    "errors": [{"reason": "rateLimitExceeded"}],
+                }
+            }
+        return {"items": []}
+
+    return handler
+
+
+def test_transient_errors_are_retried():
+    limiter = AdaptiveLimiter(backoff_base=0)
+    api = YouTubeApi("key", FakeSession(rate_limited(2)), limiter=limiter)
+
+    assert asyncio.run(api.list_videos_by_channel("channel")) == []
+    assert limiter.retries == 2
+
+
+def test_retries_are_limited():
+    limiter = AdaptiveLimiter(backoff_base=0, max_retries=1)
+    api = YouTubeApi("key", FakeSession(rate_limited(5)), limiter=limiter)
+
+    with pytest.raises(YouTubeError):
+        asyncio.run(api.list_videos_by_channel("channel"))
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+
+from tests.youtube.fake_session import FakeSession, paged
+from youtube import YouTubeApi
+
+
+def channels_handler(endpoint, params):
+    assert endpoint == "channels"
+    return {
+        "items": [
+            {
+                "id": channel,
+                "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel}},
+            }
+            for channel in params["id"].split(",")
+        ]
+    }
+
+
+def test_uploads_playlists_are_batched():
+    session = FakeSession(channels_handler)
+    api = YouTubeApi("key", session)
+    channels = ["c" + str(i) for i in range(120)]
+
+    playlists = asyncio.run(api.list_uploads_playlists(channels))
+
+    assert len(session.calls) == 3
+    assert playlists["c42"] == "UUc42"
+
+
+def test_uploads_listing_stops_at_date_clamp():
+    items = [
+        {
+            "contentDetails": {
+                "videoId": "v" + str(day),
+                "videoPublishedAt": "2021-01-%02dT12:00:00Z" % day,
+            }
+        }
+        for day in range(30, 0, -1)
+    ]
+
+    def handler(endpoint, params):
+        assert endpoint == "playlistItems"
+        return paged(items, params, 5)
+
+    session = FakeSession(handler)
+    api = YouTubeApi("key", session)
+
+    videos = asyncio.run(api.list_videos_by_uploads("c", "UUc", datetime(2021, 1, 23)))
+
+    assert [video.code for video in videos] == ["v" + str(d) for d in range(30, 22, -1)]
+    assert len(session.calls) == 2
@@ -0,0 +1,29 @@
+import asyncio
+
+from tests.youtube.fake_session import FakeSession
+from youtube import ChannelVideo, YouTubeApi
+
+
+def videos_handler(endpoint, params):
+    assert endpoint == "videos"
+    ids = params["id"].split(",")
+    assert len(ids) <= 50
+    return {
+        "items": [
+            {"kind": "youtube#video", "id": code, "snippet": {"channelId": "c"}}
+            for code in ids
+        ]
+    }
+
+
+def test_ids_are_chunked_and_deduplicated():
+    session = FakeSession(videos_handler)
+    api = YouTubeApi("key", session)
+    ids = ["v" + str(i) for i in range(120)] * 2
+    known = [ChannelVideo("c", "v0"), ChannelVideo("c", "v1")]
+
+    videos = asyncio.run(api.list_videos_by_ids(ids, known=known))
+
+    assert len(videos) == 118
+    assert ChannelVideo("c", "v0") not in videos
+    assert len(session.calls) == 3
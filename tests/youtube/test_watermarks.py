@@ -0,0 +1,53 @@
+import asyncio
+
+from tests.youtube.fake_session import FakeSession, paged, reply, thread
+from youtube import WatermarkStore, YouTubeApi
+
+
+class Video:
+    def __init__(self):
+        self.threads = [
+            thread("t3", "2021-01-03T00:00:00Z", []),
+            thread("t2", "2021-01-02T00:00:00Z", [reply("r2", "2021-01-02T01:00:00Z")]),
+            thread("t1", "2021-01-01T00:00:00Z", []),
+        ]
+
+    def handler(self, endpoint, params):
+        assert endpoint == "commentThreads"
+        assert params["order"] == "time"
+        return paged(self.threads, params, 3)
+
+
+def fetch(api: YouTubeApi):
+    async def collect():
+        return [c.id async for c in api.list_comments("video", "channel")]
+
+    return asyncio.run(collect())
+
+
+def test_second_run_fetches_only_new_comments(tmp_path):
+    video = Video()
+    store = WatermarkStore(str(tmp_path / "marks.sqlite"))
+
+    first = FakeSession(video.handler)
+    assert fetch(YouTubeApi("key", first, watermarks=store)) == ["t3", "t2", "r2", "t1"]
+
+    video.threads.insert(0, thread("t4", "2021-01-04T00:00:00Z", []))
+    video.threads[2] = thread(
+        "t2",
+        "2021-01-02T00:00:00Z",
+        [reply("r2", "2021-01-02T01:00:00Z"), reply("r5", "2021-01-05T00:00:00Z")],
+    )
+    second = FakeSession(video.handler)
+
+    assert fetch(YouTubeApi("key", second, watermarks=store)) == ["t4", "r5"]
+    # Старые страницы больше не скачиваются
+    assert len(second.calls) == 1
+
+
+def test_unchanged_video_yields_nothing(tmp_path):
+    video = Video()
+    store = WatermarkStore(str(tmp_path / "marks.sqlite"))
+    fetch(YouTubeApi("key", FakeSession(video.handler), watermarks=store))
+
+    assert fetch(YouTubeApi("key", FakeSession(video.handler), watermarks=store)) == []
@@ -4,16 +4,20 @@ import argparse
 import asyncio
 import csv
 import io
+import json
+import os
 import platform
 import re
+import sys
+import time
 from collections import defaultdict
-from typing import Tuple
+from typing import Dict, Iterator, Optional, Tuple
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession
 
 SEARCH_URL = 'https://www.t30p.ru/sd.asmx/MoreSearch'
 RE_LINK = re.compile(r'href=\"http://youtube\.com/watch\?v=([\w-]+)&amp;lc=')
-semaphore = asyncio.Semaphore(10)
+PAGE_SIZE = 30
 
 # Windows OS-specific HACK to silence exception thrown on event loop being closed
 # as part of the asyncio library's proactor
@@ -36,43 +40,186 @@ if platform.system() == 'Windows':
     _ProactorBasePipeTransport.__del__ = silence_event_loop_closed(_ProactorBasePipeTransport.__del__)
 
 
-async def fetch(client: ClientSession, user_id: str, pos: int = 0) -> Tuple[str, str]:
+# Limits concurrent requests and request rate; created per run, not at import time
+class RateLimiter:
+    def __init__(self, parallel: int = 10, rps: float = 0):
+        self._semaphore = asyncio.Semaphore(parallel)
+        self._interval = 1 / rps if rps else 0
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                delay = self._next_start - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._next_start = loop.time() + self._interval
+
+    async def __aexit__(self, *args):
+        self._semaphore.release()
+
+
+async def fetch_page(client: ClientSession, limiter: RateLimiter, user_id: str, pos: int) -> str:
     params = {
         'sParams': f'"blogname:{user_id}"',
         'pos': pos,
         'numeration': '0'
     }
     headers = {'Content-Type': 'application/json; charset=utf-8'}
-    async with semaphore, client.get(SEARCH_URL, params=params, headers=headers) as resp:
+    async with limiter, client.get(SEARCH_URL, params=params, headers=headers) as resp:
+        resp.raise_for_status()
         data = await resp.json()
-    page: str = data['d']
-    if page:
-        next_page = await fetch(client, user_id, pos + 30)
-        return user_id, page + next_page[1]
-    else:
-        return user_id, page
-
-
-async def main(infile: io.TextIOWrapper, out_filename: str) -> None:
-    result = defaultdict(int)
-    async with ClientSession() as client:
-        awaitables = []
-        for line in infile:
-            awaitables.append(fetch(client, user_id=line.strip()))
-        fetch_results = await asyncio.gather(*awaitables)
-    for user_id, html in fetch_results:
-        for m in RE_LINK.finditer(html):
-            result[user_id, m.group(1)] += 1
-    with open(out_filename, 'w', newline='') as outfile:
-        writer = csv.writer(outfile, csv.excel_tab)
-        writer.writerow(['userID', '', 'videoID', 'counter'])
-        for key, val in result.items():
-            writer.writerow([key[0], '', key[1], val])
+    return data['d']
+
+
+class UserState:
+    def __init__(self):
+        self.pos = 0  # Next page to fetch
+        self.counts = defaultdict(int)  # videoID -> counter
+        self.done = 0.0  # When all pages were fetched (0 - not yet)
+
+
+# Checkpoint journal, so an interrupted run can be resumed. Append-only JSON lines:
+#   {"user": ..., "start": time}               - fetching started from the first page
+#   {"user": ..., "pos": pos, "counts": {...}} - page at pos parsed, counters found on it
+#   {"user": ..., "done": time}                - all pages fetched
+# Users completed less than ttl seconds ago are not fetched again
+class Journal:
+    def __init__(self, path: Optional[str], ttl: float):
+        self._ttl = ttl
+        self._users: Dict[str, UserState] = {}
+        self._file = None
+        if not path:
+            return
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        break  # The last line may be cut off if the previous run was killed
+        # Compact into a temporary file and swap it in, so a crash here never loses the old journal
+        self._file = open(path + '.tmp', 'w', encoding='utf-8')
+        self._compact()
+        self._file.close()
+        os.replace(path + '.tmp', path)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _apply(self, record: dict) -> None:
+        user_id = record['user']
+        if 'start' in record or user_id not in self._users:
+            self._users[user_id] = UserState()
+        state = self._users[user_id]
+        if 'pos' in record:
+            state.pos = record['pos'] + PAGE_SIZE
+            for video_id, counter in record['counts'].items():
+                state.counts[video_id] += counter
+        if 'done' in record:
+            state.done = record['done']
+
+    def _write(self, record: dict) -> None:
+        self._apply(record)
+        if self._file:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def _compact(self) -> None:
+        # Rewrite the journal with one set of records per user and without expired users
+        users, self._users = self._users, {}
+        for user_id, state in users.items():
+            if state.done and not self._fresh(state):
+                continue
+            self._write({'user': user_id, 'start': time.time()})
+            if state.pos:
+                self._write({'user': user_id, 'pos': state.pos - PAGE_SIZE, 'counts': state.counts})
+            if state.done:
+                self._write({'user': user_id, 'done': state.done})
+
+    def _fresh(self, state: UserState) -> bool:
+        return time.time() - state.done < self._ttl
+
+    def cached(self, user_id: str) -> Optional[Dict[str, int]]:
+        state = self._users.get(user_id)
+        if state and state.done and self._fresh(state):
+            return state.counts
+        return None
+
+    def resume(self, user_id: str) -> Tuple[int, Dict[str, int]]:
+        state = self._users.get(user_id)
+        if not state or state.done:
+            self._write({'user': user_id, 'start': time.time()})
+            state = self._users[user_id]
+        return state.pos, state.counts
+
+    def page(self, user_id: str, pos: int, counts: Dict[str, int]) -> None:
+        self._write({'user': user_id, 'pos': pos, 'counts': counts})
+
+    def done(self, user_id: str) -> None:
+        self._write({'user': user_id, 'done': time.time()})
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+async def fetch(client: ClientSession, limiter: RateLimiter, journal: Journal, user_id: str) -> Dict[str, int]:
+    # Each page is parsed as it arrives and then dropped; an interrupted user is resumed from the last page
+    pos, counts = journal.resume(user_id)
+    while True:
+        page = await fetch_page(client, limiter, user_id, pos)
+        if not page:
+            journal.done(user_id)
+            return counts
+        page_counts = defaultdict(int)
+        for m in RE_LINK.finditer(page):
+            page_counts[m.group(1)] += 1
+        journal.page(user_id, pos, page_counts)
+        pos += PAGE_SIZE
+
+
+async def worker(client: ClientSession, limiter: RateLimiter, journal: Journal, users: Iterator[str],
+                 writer, outfile) -> None:
+    # Workers share one iterator, so the user list is never loaded into memory as a whole
+    for user_id in users:
+        counts = journal.cached(user_id)
+        if counts is None:
+            try:
+                counts = await fetch(client, limiter, journal, user_id)
+            except (ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                # The user stays in the journal unfinished and is resumed on the next run
+                print(f'{user_id}: {type(e).__name__} {e}, run again to resume', file=sys.stderr)
+                continue
+        for video_id, counter in counts.items():
+            writer.writerow([user_id, '', video_id, counter])
+        outfile.flush()
+
+
+async def main(infile: io.TextIOWrapper, out_filename: str, parallel: int = 10, rps: float = 0,
+               journal_filename: Optional[str] = None, ttl: float = 24 * 3600) -> None:
+    users = (line.strip() for line in infile if line.strip())
+    limiter = RateLimiter(parallel, rps)
+    journal = Journal(journal_filename, ttl)
+    try:
+        with open(out_filename, 'w', newline='') as outfile:
+            writer = csv.writer(outfile, csv.excel_tab)
+            writer.writerow(['userID', '', 'videoID', 'counter'])
+            async with ClientSession() as client:
+                await asyncio.gather(*[worker(client, limiter, journal, users, writer, outfile)
+                                       for _ in range(parallel)])
+    finally:
+        journal.close()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('infile', nargs='?', type=argparse.FileType('r'), default='user_id_list.txt')
     parser.add_argument('outfile', nargs='?', default='report.tsv')
+    parser.add_argument('--parallel', type=int, default=10, help='concurrent requests')
+    parser.add_argument('--rps', type=float, default=0, help='max requests per second (0 - unlimited)')
+    parser.add_argument('--journal', default='t30p_journal.jsonl', help='checkpoint journal ("" - disable)')
+    parser.add_argument('--ttl', type=float, default=24, help='hours to reuse results of completed users')
     args = parser.parse_args()
-    asyncio.run(main(args.infile, args.outfile))
+    asyncio.run(main(args.infile, args.outfile, args.parallel, args.rps, args.journal, args.ttl * 3600))
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+
+import t30p
+from t30p import PAGE_SIZE, Journal
+
+PAGES = {
+    'user1': ['href="http://youtube.com/watch?v=a1&amp;lc=x"', 'href="http://youtube.com/watch?v=a2&amp;lc=y"'],
+    'user2': ['href="http://youtube.com/watch?v=b1&amp;lc=z"'],
+}
+
+
+def fake_pages(requests):
+    async def fetch_page(client, limiter, user_id, pos):
+        requests.append((user_id, pos))
+        pages = PAGES[user_id]
+        return pages[pos // PAGE_SIZE] if pos // PAGE_SIZE < len(pages) else ''
+    return fetch_page
+
+
+def run(tmp_path, monkeypatch, journal, ttl=3600):
+    requests = []
+    monkeypatch.setattr(t30p, 'fetch_page', fake_pages(requests))
+    infile = tmp_path / 'users.txt'
+    infile.write_text('user1\nuser2\n')
+    with open(infile) as users:
+        asyncio.run(t30p.main(users, str(tmp_path / 'report.tsv'), 2, 0, journal, ttl))
+    rows = (tmp_path / 'report.tsv').read_text().splitlines()[1:]
+    return requests, sorted(rows)
+
+
+def test_finished_users_are_skipped(tmp_path, monkeypatch):
+    journal = str(tmp_path / 'journal.jsonl')
+    first, rows = run(tmp_path, monkeypatch, journal)
+    second, rows_again = run(tmp_path, monkeypatch, journal)
+
+    assert len(first) == 5
+    assert second == []
+    assert rows_again == rows == ['user1\t\ta1\t1', 'user1\t\ta2\t1', 'user2\t\tb1\t1']
+
+
+def test_expired_users_are_fetched_again(tmp_path, monkeypatch):
+    journal = str(tmp_path / 'journal.jsonl')
+    run(tmp_path, monkeypatch, journal)
+    requests, _ = run(tmp_path, monkeypatch, journal, ttl=0)
+
+    assert len(requests) == 5
+
+
+def test_resume_from_checkpoint_with_truncated_line(tmp_path, monkeypatch):
+    journal = tmp_path / 'journal.jsonl'
+    records = [
+        {'user': 'user1', 'start': time.time()},
+        {'user': 'user1', 'pos': 0, 'counts': {'a1': 1}},
+    ]
+    # The previous run was killed while writing the last line
+    journal.write_text(''.join(json.dumps(record) + '\n' for record in records) + '{"user": "us')
+
+    requests, rows = run(tmp_path, monkeypatch, str(journal))
+
+    assert ('user1', 0) not in requests
+    assert ('user1', PAGE_SIZE) in requests
+    assert rows == ['user1\t\ta1\t1', 'user1\t\ta2\t1', 'user2\t\tb1\t1']
+
+
+def test_compaction_keeps_journal_readable(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path, 3600)
+    journal.resume('user1')
+    journal.page('user1', 0, {'a1': 2})
+    journal.done('user1')
+    journal.close()
+
+    # Each reopening compacts the journal again
+    for _ in range(2):
+        reopened = Journal(path, 3600)
+        assert reopened.cached('user1') == {'a1': 2}
+        reopened.close()
+    assert not (tmp_path / 'journal.jsonl.tmp').exists()
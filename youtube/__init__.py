@@ -1,3 +1,28 @@
-from .youtube import ChannelInfo, ChannelVideo, Comment, YouTubeApi
+from .archive import CommentArchive
+from .budget import CommentBudget
+from .cache import ResponseCache
+from .keys import KeyPool, NoWorkingKeys
+from .quota import QuotaExhausted, QuotaScheduler
+from .telemetry import Telemetry
+from .throttle import AdaptiveLimiter
+from .watermarks import WatermarkStore
+from .youtube import (ChannelInfo, ChannelVideo, Comment, YouTubeApi,
+                      YouTubeError)
 
-__all__ = ["YouTubeApi", "Comment", "ChannelVideo", "ChannelInfo"]
+__all__ = [
+    "YouTubeApi",
+    "YouTubeError",
+    "Comment",
+    "ChannelVideo",
+    "ChannelInfo",
+    "ResponseCache",
+    "WatermarkStore",
+    "QuotaScheduler",
+    "QuotaExhausted",
+    "AdaptiveLimiter",
+    "KeyPool",
+    "NoWorkingKeys",
+    "CommentArchive",
+    "CommentBudget",
+    "Telemetry",
+]
@@ -0,0 +1,156 @@
+"""
+Локальный архив скачанных комментариев.
+Все комментарии, которые когда-либо скачивались, хранятся в SQLite с индексами по автору, каналу и видео, поэтому
+вопросы вроде "что этот аккаунт писал за последний месяц" решаются запросом к базе, а статистику с другими фильтрами
+ботов можно пересобрать без обращения к API
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from .youtube import Comment
+
+# Сколько комментариев накапливается в памяти перед записью в базу одной транзакцией
+ARCHIVE_BATCH_SIZE = 1000
+
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Когда комментарий оставлен; у записей из старых архивов даты публикации нет, для них берётся время скачивания
+_POSTED = "COALESCE(published, fetched_at)"
+
+
+def _format_date(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime(_DATE_FORMAT) if value else None
+
+
+def _read_date(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, _DATE_FORMAT) if value else None
+
+
+class CommentArchive:
+    def __init__(self, path: str, batch_size: int = ARCHIVE_BATCH_SIZE):
+        """
+        Архив комментариев в SQLite
+        :param path: путь к файлу базы
+        :param batch_size: сколько комментариев записывать за одну транзакцию
+        """
+        self._batch_size = batch_size
+        self._batch: List[Tuple] = []
+        self._db = sqlite3.connect(path)
+        # WAL: чтение архива (например, из python -m statistics) не блокирует запись во время загрузки
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS comments ("
+            "id TEXT PRIMARY KEY, author TEXT, channel TEXT, video TEXT, comment TEXT, fetched_at TEXT, "
+            "published TEXT, updated TEXT)"
+        )
+        # В архивах, созданных до появления дат публикации, этих столбцов нет
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(comments)")}
+        for column in ("published", "updated"):
+            if column not in columns:
+                self._db.execute("ALTER TABLE comments ADD COLUMN " + column + " TEXT")
+        # Фильтр since идёт по времени публикации, поэтому индексы строятся по тому же выражению
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS comments_posted ON comments (" + _POSTED + ")"
+        )
+        for column in ("author", "channel", "video"):
+            self._db.execute("DROP INDEX IF EXISTS comments_" + column)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS comments_"
+                + column
+                + "_posted ON comments ("
+                + column
+                + ", "
+                + _POSTED
+                + ")"
+            )
+        self._db.commit()
+
+    def add(self, comment: Comment):
+        """
+        Добавить комментарий в архив. Комментарии записываются пачками, повторно скачанный комментарий заменяет
+        старую версию
+        """
+        self._batch.append(
+            (
+                comment.id,
+                comment.author,
+                comment.channel,
+                comment.video,
+                comment.comment,
+                datetime.now(timezone.utc).strftime(_DATE_FORMAT),
+                _format_date(comment.published),
+                _format_date(comment.updated),
+            )
+        )
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Записать накопленные комментарии
+        """
+        if not self._batch:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO comments "
+            "(id, author, channel, video, comment, fetched_at, published, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._batch,
+        )
+        self._db.commit()
+        self._batch = []
+
+    def comments(
+        self,
+        author: Optional[str] = None,
+        channel: Optional[str] = None,
+        video: Optional[str] = None,
+        since: Optional[datetime] = None,
+    ) -> Iterator[Comment]:
+        """
+        Комментарии из архива (незаписанные комментарии сначала записываются)
+        :param author: только комментарии этого пользователя
+        :param channel: только комментарии под видео этого канала
+        :param video: только комментарии под этим видео
+        :param since: только комментарии, оставленные не раньше этого момента (UTC); для комментариев без даты
+        публикации из старых архивов сравнивается время скачивания
+        :return: Комментарии в порядке скачивания
+        """
+        self.flush()
+        conditions = []
+        params = []
+        for column, value in (
+            ("author", author),
+            ("channel", channel),
+            ("video", video),
+        ):
+            if value is not None:
+                conditions.append(column + " = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append(_POSTED + " >= ?")
+            params.append(since.strftime(_DATE_FORMAT))
+
+        query = "SELECT channel, video, author, comment, id, published, updated FROM comments"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY fetched_at"
+        for row in self._db.execute(query, params):
+            yield Comment(*row[:5], _read_date(row[5]), _read_date(row[6]))
+
+    def __len__(self):
+        self.flush()
+        return self._db.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,55 @@
+"""
+Ограничения на число скачиваемых комментариев: под одним видео, на одном канале и за весь запуск.
+YouTubeApi.list_comments подбирает размер страниц под оставшийся бюджет и не загружает ответы, на которые его уже не
+хватит, поэтому запуск с ограничением тратит предсказуемое время и квоту даже на популярных видео
+"""
+from typing import Dict, Optional
+
+
+class CommentBudget:
+    def __init__(self, total: int = 0, per_channel: int = 0, per_video: int = 0):
+        """
+        Бюджет комментариев (0 - без ограничения)
+        :param total: сколько комментариев можно скачать за весь запуск
+        :param per_channel: сколько комментариев можно скачать под видео одного канала
+        :param per_video: сколько комментариев можно скачать под одним видео
+        """
+        self.total = total
+        self.per_channel = per_channel
+        self.per_video = per_video
+        self.spent = 0
+        self._channels: Dict[str, int] = {}
+        self._videos: Dict[str, int] = {}
+
+    def remaining(self, channel: str, video: str) -> Optional[int]:
+        """
+        Сколько ещё комментариев можно скачать под видео
+        :return: количество или None, если ограничений нет
+        """
+        limits = []
+        if self.per_video:
+            limits.append(self.per_video - self._videos.get(video, 0))
+        if self.per_channel:
+            limits.append(self.per_channel - self._channels.get(channel, 0))
+        if self.total:
+            limits.append(self.total - self.spent)
+        return max(min(limits), 0) if limits else None
+
+    def take(self, channel: str, video: str) -> bool:
+        """
+        Учесть скачанный комментарий
+        :return: False, если бюджет уже исчерпан (комментарий не учитывается)
+        """
+        if self.remaining(channel, video) == 0:
+            return False
+        self.spent += 1
+        self._channels[channel] = self._channels.get(channel, 0) + 1
+        self._videos[video] = self._videos.get(video, 0) + 1
+        return True
+
+    @property
+    def exhausted(self) -> bool:
+        """
+        Исчерпан ли общий бюджет запуска
+        """
+        return bool(self.total) and self.spent >= self.total
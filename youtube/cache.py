@@ -0,0 +1,193 @@
+"""
+Постоянный кэш ответов YouTube API на диске (SQLite).
+Повторные запуски в течение дня берут уже скачанные страницы из кэша и не тратят квоту
+"""
+import json
+import sqlite3
+import zlib
+from time import time
+from typing import Dict, Optional
+
+# Время жизни записей кэша в секундах для каждого метода API. 0 - не кэшировать
+DEFAULT_TTL = {
+    "search": 12 * 3600,
+    "playlistItems": 12 * 3600,
+    "videos": 24 * 3600,
+    "channels": 24 * 3600,
+    "commentThreads": 3 * 3600,
+    "comments": 3 * 3600,
+}
+
+# Параметры запроса, которые не влияют на ответ и не должны попадать в ключ кэша
+_IGNORED_PARAMS = {"key"}
+
+# Сколько операций с кэшем накапливается перед записью на диск одной транзакцией
+CACHE_COMMIT_EVERY = 200
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str,
+        ttl: Optional[Dict[str, int]] = None,
+        max_size: int = 256 * 1024 * 1024,
+    ):
+        """
+        Кэш ответов API
+        :param path: путь к файлу базы
+        :param ttl: время жизни записей по методам API (в секундах), дополняет DEFAULT_TTL
+        :param max_size: максимальный размер кэша в байтах; самые давно использованные записи будут удалены
+        """
+        self._ttl = dict(DEFAULT_TTL)
+        if ttl:
+            self._ttl.update(ttl)
+        self._max_size = max_size
+
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, expires REAL, accessed REAL, size INTEGER, data BLOB)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        # Просроченные записи больше не понадобятся
+        self._db.execute("DELETE FROM responses WHERE expires < ?", (time(),))
+        self._db.commit()
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        # Ключ -> время последнего обращения; записываются в базу вместе с остальными изменениями
+        self._accessed: Dict[str, float] = {}
+        self._uncommitted = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def make_key(cls, endpoint: str, params: Optional[Dict]) -> str:
+        """
+        Построить ключ кэша: метод API и отсортированные параметры без API ключа
+        :param endpoint: метод API (например, "videos")
+        :param params: параметры запроса
+        :return: ключ
+        """
+        normalized = {}
+        for name, value in (params or {}).items():
+            if name in _IGNORED_PARAMS:
+                continue
+            value = str(value)
+            if "," in value:  # "snippet, id" и "snippet,id" - одно и то же
+                value = ",".join(part.strip() for part in value.split(","))
+            normalized[name] = value
+        return endpoint + "?" + json.dumps(normalized, sort_keys=True)
+
+    def get(self, endpoint: str, params: Optional[Dict]) -> Optional[Dict]:
+        """
+        Найти ответ в кэше
+        :param endpoint: метод API
+        :param params: параметры запроса
+        :return: json словарь или None, если в кэше ответа нет
+        """
+        if not self._ttl.get(endpoint):
+            return None
+
+        key = self.make_key(endpoint, params)
+        now = time()
+        row = self._db.execute(
+            "SELECT data FROM responses WHERE key = ? AND expires >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self._accessed[key] = now
+        self._changed()
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, endpoint: str, params: Optional[Dict], data: Dict):
+        """
+        Сохранить ответ в кэш
+        :param endpoint: метод API
+        :param params: параметры запроса
+        :param data: json словарь ответа
+        """
+        ttl = self._ttl.get(endpoint)
+        if not ttl:
+            return
+
+        key = self.make_key(endpoint, params)
+        blob = zlib.compress(json.dumps(data).encode("utf-8"))
+        now = time()
+
+        old = self._db.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if old:
+            self._size -= old[0]
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (key, endpoint, now + ttl, now, len(blob), blob),
+        )
+        self._size += len(blob)
+        self._accessed.pop(key, None)
+        self._evict()
+        self._changed()
+
+    def _changed(self):
+        """
+        Учесть изменение; изменения записываются на диск пачками по CACHE_COMMIT_EVERY, а не по одному
+        """
+        self._uncommitted += 1
+        if self._uncommitted >= CACHE_COMMIT_EVERY:
+            self.flush()
+
+    def _write_accessed(self):
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed = {}
+
+    def flush(self):
+        """
+        Записать накопленные изменения на диск (потеря времени обращения при сбое ни на что не влияет)
+        """
+        self._write_accessed()
+        self._db.commit()
+        self._uncommitted = 0
+
+    def _evict(self):
+        """
+        Удалить самые давно использованные записи, пока кэш не уложится в max_size
+        """
+        if self._size > self._max_size:
+            # Порядок удаления зависит от времени обращения
+            self._write_accessed()
+        while self._size > self._max_size:
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self._max_size:
+                    return
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def stat(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": self._size}
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,110 @@
+"""
+Набор API ключей: у каждого ключа своя дневная квота, поэтому несколько ключей позволяют обойти за один запуск
+больше каналов. Запрос уходит с самым "здоровым" ключом, а ключи с исчерпанной квотой выводятся из оборота до сброса
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from .quota import QUOTA_TIMEZONE, QuotaExhausted
+
+# До какого момента не используется ключ, который не работает
+_FOREVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+class NoWorkingKeys(Exception):
+    """
+    Ни один ключ не работает (неверные, отозванные или без доступа к API). В отличие от QuotaExhausted, загрузку
+    нельзя продолжить с тем, что уже скачано: это ошибка настройки
+    """
+
+
+@dataclass
+class KeyState:
+    key: str
+    spent: int = 0  # Потраченная квота за этот запуск
+    errors: int = 0  # Ошибок подряд
+    disabled_until: Optional[datetime] = None  # До какого момента ключ не используется
+
+
+def next_quota_reset() -> datetime:
+    """
+    Момент следующего сброса квоты (полночь по тихоокеанскому времени)
+    """
+    now = datetime.now(QUOTA_TIMEZONE)
+    return datetime(now.year, now.month, now.day, tzinfo=QUOTA_TIMEZONE) + timedelta(
+        days=1
+    )
+
+
+class KeyPool:
+    def __init__(self, keys: Iterable[str], budget: int = 10000):
+        """
+        Набор ключей
+        :param keys: API ключи (повторы и пустые строки отбрасываются)
+        :param budget: дневная квота одного ключа
+        """
+        self._keys: Dict[str, KeyState] = {
+            key: KeyState(key) for key in dict.fromkeys(keys) if key
+        }
+        self._budget = budget
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def _usable(self, state: KeyState, cost: int) -> bool:
+        if state.disabled_until and state.disabled_until > datetime.now(timezone.utc):
+            return False
+        return state.spent + cost <= self._budget
+
+    @property
+    def available(self) -> bool:
+        """
+        Есть ли ещё ключи, с которыми можно делать запросы
+        """
+        return any(self._usable(state, 1) for state in self._keys.values())
+
+    def acquire(self, cost: int = 1) -> str:
+        """
+        Выбрать ключ для запроса и списать с него стоимость запроса.
+        Выбирается ключ с наименьшим числом ошибок подряд, а среди них - с наименьшими тратами
+        :param cost: стоимость запроса в единицах квоты
+        :return: ключ
+        """
+        usable = [state for state in self._keys.values() if self._usable(state, cost)]
+        if not usable:
+            if all(state.disabled_until == _FOREVER for state in self._keys.values()):
+                raise NoWorkingKeys("No working API keys")
+            raise QuotaExhausted("All API keys are out of quota")
+        state = min(usable, key=lambda s: (s.errors, s.spent))
+        state.spent += cost
+        return state.key
+
+    def succeeded(self, key: str):
+        self._keys[key].errors = 0
+
+    def failed(self, key: str):
+        self._keys[key].errors += 1
+
+    def exhaust(self, key: str):
+        """
+        Квота ключа исчерпана: не использовать его до сброса квоты
+        """
+        self._keys[key].disabled_until = next_quota_reset()
+
+    def disable(self, key: str):
+        """
+        Ключ не работает (неверный, отозван, API не включено): не использовать его до конца запуска
+        """
+        self._keys[key].disabled_until = _FOREVER
+
+    @property
+    def stat(self) -> Dict[str, int]:
+        """
+        Потраченная квота по ключам (ключи сокращены до последних символов)
+        """
+        return {"..." + key[-4:]: state.spent for key, state in self._keys.items()}
@@ -0,0 +1,177 @@
+"""
+Планировщик запросов к YouTube API с учётом квоты.
+Каждый метод API стоит определённое количество единиц квоты (https://developers.google.com/youtube/v3/determine_quota_cost),
+планировщик следит за тратами в пределах дневного бюджета и пропускает запросы по приоритету
+"""
+import asyncio
+import heapq
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from os.path import isfile
+from typing import Dict, Optional
+
+from .throttle import AdaptiveLimiter
+
+# Стоимость одного запроса в единицах квоты
+QUOTA_COSTS = {
+    "search": 100,
+    "videos": 1,
+    "commentThreads": 1,
+    "comments": 1,
+    "channels": 1,
+    "playlistItems": 1,
+}
+
+# Приоритеты запросов по умолчанию (чем меньше число, тем раньше запрос будет выполнен):
+# сначала найти видео, потом скачать комментарии, и в последнюю очередь - длинные ветки ответов
+PRIORITIES = {
+    "channels": 0,
+    "videos": 0,
+    "search": 1,
+    "playlistItems": 1,
+    "commentThreads": 2,
+    "comments": 3,
+}
+
+# Квота сбрасывается в полночь по тихоокеанскому времени (здесь без учёта перехода на летнее время)
+QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+class QuotaExhausted(Exception):
+    """
+    Дневной бюджет квоты израсходован
+    """
+
+
+def quota_day() -> str:
+    """
+    Текущий день с точки зрения квоты YouTube API
+    """
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        budget: int,
+        concurrency: int = 10,
+        state_path: Optional[str] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+    ):
+        """
+        Планировщик запросов
+        :param budget: дневной бюджет квоты
+        :param concurrency: сколько запросов может выполняться одновременно
+        :param limiter: адаптивный ограничитель; если указан, число одновременных запросов берётся из него вместо
+                        concurrency, чтобы очередь по приоритетам оставалась в планировщике
+        :param state_path: файл, в котором хранятся траты за текущий день (чтобы несколько запусков в один день
+                           делили один бюджет). Если не указан, бюджет считается только для текущего запуска
+        """
+        self._budget = budget
+        self._concurrency = concurrency
+        self._limiter = limiter
+        self._state_path = state_path
+        self._active = 0
+        self._queue = []  # Куча из (приоритет, порядковый номер, future)
+        self._counter = count()
+        self._day = quota_day()
+        self._spent = 0
+        self._spent_by_endpoint: Dict[str, int] = {}
+
+        if state_path and isfile(state_path):
+            with open(state_path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            if state.get("day") == self._day:
+                self._spent = state["spent"]
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.limit if self._limiter else self._concurrency
+
+    @property
+    def spent(self) -> int:
+        return self._spent
+
+    @property
+    def remaining(self) -> int:
+        return max(self._budget - self._spent, 0)
+
+    @property
+    def stat(self) -> Dict[str, int]:
+        """
+        Потраченная за этот запуск квота по методам API
+        """
+        return dict(self._spent_by_endpoint)
+
+    def exhaust(self):
+        """
+        Считать бюджет израсходованным (например, если API сам ответил quotaExceeded)
+        """
+        self._spent = max(self._spent, self._budget)
+
+    def save(self):
+        """
+        Сохранить траты за текущий день
+        """
+        if not self._state_path:
+            return
+        with open(self._state_path, "w", encoding="utf-8") as file:
+            json.dump({"day": self._day, "spent": self._spent}, file)
+
+    async def _acquire(self, priority: int):
+        if self._active < self.concurrency and not self._queue:
+            self._active += 1
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Место уже было выделено, но задачу отменили - отдать место следующему
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        self._active -= 1
+        while self._queue and self._active < self.concurrency:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str, priority: Optional[int] = None):
+        """
+        Дождаться своей очереди и списать стоимость запроса с бюджета
+        :param endpoint: метод API
+        :param priority: приоритет запроса (по умолчанию - из PRIORITIES)
+        """
+        if priority is None:
+            priority = PRIORITIES.get(endpoint, 0)
+        await self._acquire(priority)
+        try:
+            cost = QUOTA_COSTS.get(endpoint, 1)
+            if self._spent + cost > self._budget:
+                raise QuotaExhausted(
+                    "Quota budget exhausted ("
+                    + str(self._spent)
+                    + " of "
+                    + str(self._budget)
+                    + " units spent)"
+                )
+            self._spent += cost
+            self._spent_by_endpoint[endpoint] = (
+                self._spent_by_endpoint.get(endpoint, 0) + cost
+            )
+            yield
+        finally:
+            self._release()
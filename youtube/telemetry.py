@@ -0,0 +1,251 @@
+"""
+Телеметрия запросов к API.
+Подключается к общей aiohttp сессии через TraceConfig и считает по каждому методу API количество запросов, ошибки,
+объём ответов, время ответа (гистограмма) и квоту, а также время и квоту по каналам и видео. В конце запуска итог
+сохраняется в JSON и в текстовом формате Prometheus
+"""
+import asyncio
+import json
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from aiohttp import TraceConfig
+
+from .quota import QUOTA_COSTS
+from .throttle import AdaptiveLimiter
+
+# Границы корзин гистограммы времени ответа в секундах (последняя корзина - всё, что дольше)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_LATENCY_LABELS = [str(le) for le in LATENCY_BUCKETS] + ["+Inf"]
+
+
+@dataclass
+class EndpointStat:
+    requests: int = 0
+    errors: int = 0  # Ответы с кодом ошибки и оборванные запросы
+    bytes: int = 0  # Объём ответов
+    seconds: float = 0.0  # Суммарное время ответа
+    quota: int = 0
+    # Количество запросов по корзинам LATENCY_BUCKETS (не накопительно)
+    latency: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+
+@dataclass
+class SubjectStat:
+    requests: int = 0
+    seconds: float = 0.0
+    quota: int = 0
+    pages: int = 0  # Страниц веток комментариев
+
+
+class Telemetry:
+    def __init__(self, limiter: Optional[AdaptiveLimiter] = None):
+        """
+        Телеметрия
+        :param limiter: адаптивный ограничитель, из которого берётся число повторов запросов
+        """
+        self._limiter = limiter
+        self.endpoints: Dict[str, EndpointStat] = {}
+        self.channels: Dict[str, SubjectStat] = {}
+        self.videos: Dict[str, SubjectStat] = {}
+
+    def trace_config(self) -> TraceConfig:
+        """
+        TraceConfig для aiohttp сессии: ClientSession(trace_configs=[telemetry.trace_config()]).
+        Канал и видео, к которым относится запрос, передаются через trace_request_ctx
+        """
+        config = TraceConfig(trace_config_ctx_factory=self._trace_context)
+        config.on_request_start.append(self._on_request_start)
+        config.on_request_end.append(self._on_request_end)
+        config.on_request_exception.append(self._on_request_exception)
+        config.on_response_chunk_received.append(self._on_chunk)
+        return config
+
+    @classmethod
+    def _trace_context(cls, trace_request_ctx=None) -> SimpleNamespace:
+        return SimpleNamespace(subject=trace_request_ctx or {}, start=0.0, endpoint="")
+
+    async def _on_request_start(self, session, context, params):
+        context.endpoint = params.url.path.rsplit("/", 1)[-1]
+        context.start = asyncio.get_event_loop().time()
+
+    async def _on_request_end(self, session, context, params):
+        self.record(
+            context.endpoint,
+            asyncio.get_event_loop().time() - context.start,
+            params.response.status,
+            context.subject.get("channel"),
+            context.subject.get("video"),
+        )
+
+    async def _on_request_exception(self, session, context, params):
+        self.record(
+            context.endpoint,
+            asyncio.get_event_loop().time() - context.start,
+            0,
+            context.subject.get("channel"),
+            context.subject.get("video"),
+        )
+
+    async def _on_chunk(self, session, context, params):
+        self._endpoint(context.endpoint).bytes += len(params.chunk)
+
+    def _endpoint(self, endpoint: str) -> EndpointStat:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointStat()
+        return self.endpoints[endpoint]
+
+    def record(
+        self,
+        endpoint: str,
+        seconds: float,
+        status: int,
+        channel: Optional[str] = None,
+        video: Optional[str] = None,
+    ):
+        """
+        Учесть запрос
+        :param endpoint: метод API
+        :param seconds: время ответа
+        :param status: код ответа (0 - ответа нет, соединение оборвалось)
+        :param channel: канал, к которому относится запрос
+        :param video: видео, к которому относится запрос
+        """
+        stat = self._endpoint(endpoint)
+        stat.requests += 1
+        stat.seconds += seconds
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        stat.latency[bucket] += 1
+        # Квота списывается за запросы, на которые API ответил, кроме ошибок сервера
+        quota = QUOTA_COSTS.get(endpoint, 1) if 0 < status < 500 else 0
+        stat.quota += quota
+        if not 200 <= status < 300:
+            stat.errors += 1
+
+        for subjects, subject in ((self.channels, channel), (self.videos, video)):
+            if subject is None:
+                continue
+            if subject not in subjects:
+                subjects[subject] = SubjectStat()
+            subjects[subject].requests += 1
+            subjects[subject].seconds += seconds
+            subjects[subject].quota += quota
+            if endpoint == "commentThreads":
+                subjects[subject].pages += 1
+
+    @classmethod
+    def _top(cls, subjects: Dict[str, SubjectStat], top: int) -> List[Dict]:
+        ordered = sorted(subjects.items(), key=lambda item: -item[1].seconds)[:top]
+        return [
+            {"id": subject, **asdict(stat), "seconds": round(stat.seconds, 3)}
+            for subject, stat in ordered
+        ]
+
+    def summary(self, top: int = 20) -> Dict:
+        """
+        Итог: статистика по методам API, самые долгие каналы и видео и число страниц веток на видео
+        :param top: сколько каналов и видео включить
+        """
+        pages = [stat.pages for stat in self.videos.values() if stat.pages]
+        return {
+            "endpoints": {
+                endpoint: {
+                    **asdict(stat),
+                    "seconds": round(stat.seconds, 3),
+                    "latency": dict(zip(_LATENCY_LABELS, stat.latency)),
+                }
+                for endpoint, stat in self.endpoints.items()
+            },
+            "requests": sum(stat.requests for stat in self.endpoints.values()),
+            "quota": sum(stat.quota for stat in self.endpoints.values()),
+            "retries": self._limiter.retries if self._limiter else 0,
+            "throttled": self._limiter.throttled if self._limiter else 0,
+            "pages_per_video": {
+                "videos": len(pages),
+                "max": max(pages, default=0),
+                "mean": round(sum(pages) / len(pages), 2) if pages else 0,
+            },
+            "top_channels": self._top(self.channels, top),
+            "top_videos": self._top(self.videos, top),
+        }
+
+    def prometheus(self) -> str:
+        """
+        Итог в текстовом формате Prometheus
+        """
+        lines = []
+
+        def metric(name: str, kind: str, help: str, values: Dict[str, float]):
+            lines.append("# HELP " + name + " " + help)
+            lines.append("# TYPE " + name + " " + kind)
+            for labels, value in values.items():
+                lines.append(name + labels + " " + str(value))
+
+        def by_endpoint(attribute: str) -> Dict[str, float]:
+            return {
+                '{endpoint="' + endpoint + '"}': getattr(stat, attribute)
+                for endpoint, stat in self.endpoints.items()
+            }
+
+        metric(
+            "youtube_api_requests_total", "counter", "Requests", by_endpoint("requests")
+        )
+        metric(
+            "youtube_api_errors_total",
+            "counter",
+            "Failed requests",
+            by_endpoint("errors"),
+        )
+        metric(
+            "youtube_api_response_bytes_total",
+            "counter",
+            "Response size",
+            by_endpoint("bytes"),
+        )
+        metric(
+            "youtube_api_quota_units_total",
+            "counter",
+            "Quota units",
+            by_endpoint("quota"),
+        )
+
+        name = "youtube_api_request_duration_seconds"
+        lines.append("# HELP " + name + " Response time")
+        lines.append("# TYPE " + name + " histogram")
+        for endpoint, stat in self.endpoints.items():
+            cumulative = 0
+            for le, count in zip(_LATENCY_LABELS, stat.latency):
+                cumulative += count
+                lines.append(
+                    name
+                    + '_bucket{endpoint="'
+                    + endpoint
+                    + '",le="'
+                    + le
+                    + '"} '
+                    + str(cumulative)
+                )
+            labels = '{endpoint="' + endpoint + '"} '
+            lines.append(name + "_sum" + labels + str(round(stat.seconds, 6)))
+            lines.append(name + "_count" + labels + str(stat.requests))
+
+        if self._limiter:
+            metric(
+                "youtube_api_retries_total",
+                "counter",
+                "Retried requests",
+                {"": self._limiter.retries},
+            )
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str):
+        """
+        Сохранить итог в <path>.json и <path>.prom
+        """
+        with open(path + ".json", "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+        with open(path + ".prom", "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
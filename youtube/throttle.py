@@ -0,0 +1,122 @@
+"""
+Адаптивное ограничение числа одновременных запросов к API.
+Работает по схеме AIMD (additive increase / multiplicative decrease): пока запросы проходят, лимит понемногу растёт,
+а когда API начинает ограничивать частоту запросов, лимит уменьшается в несколько раз. Так нагрузка держится около
+максимальной, которую API выдерживает без отказов
+"""
+import asyncio
+import random
+from collections import deque
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = 5,
+        minimum: int = 1,
+        maximum: int = 50,
+        decrease: float = 0.5,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        """
+        Ограничитель
+        :param initial: начальный лимит одновременных запросов
+        :param minimum: минимальный лимит
+        :param maximum: максимальный лимит
+        :param decrease: во сколько раз уменьшается лимит при ограничении со стороны API
+        :param max_retries: сколько раз можно повторить запрос после временной ошибки
+        :param backoff_base: задержка перед первым повтором в секундах (дальше растёт экспоненциально)
+        :param backoff_cap: максимальная задержка перед повтором в секундах
+        """
+        self._limit = float(initial)
+        self._minimum = minimum
+        self._maximum = maximum
+        self._decrease = decrease
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self.max_retries = max_retries
+
+        self._active = 0
+        self._waiters = deque()
+        # Номер "поколения" лимита: запросы, начатые до последнего уменьшения, не должны уменьшать его ещё раз
+        self._epoch = 0
+
+        self.retries = 0  # Сколько раз запросы повторялись
+        self.throttled = 0  # Сколько раз API ограничивал частоту запросов
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def stat(self):
+        return {
+            "limit": self.limit,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+    async def acquire(self) -> int:
+        """
+        Дождаться свободного места
+        :return: поколение лимита, которое нужно передать в release
+        """
+        while self._active >= self.limit:
+            future = asyncio.get_event_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Нас разбудили, но задачу отменили - разбудить следующего
+                if future.done() and not future.cancelled():
+                    self._wake()
+                raise
+        self._active += 1
+        return self._epoch
+
+    def release(self, epoch: int, throttled: bool = False):
+        """
+        Освободить место и поправить лимит
+        :param epoch: поколение лимита, которое вернул acquire
+        :param throttled: API ответил, что запросов слишком много
+        """
+        self._active -= 1
+        if throttled:
+            self.throttled += 1
+            if epoch == self._epoch:
+                self._limit = max(self._minimum, self._limit * self._decrease)
+                self._epoch += 1
+        else:
+            # +1 к лимиту примерно за каждый лимит успешных запросов
+            self._limit = min(self._maximum, self._limit + 1 / self._limit)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._active < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Задержка перед повтором: экспоненциальная, со случайным разбросом, чтобы повторы не шли одной волной
+        :param attempt: номер повтора, начиная с 0
+        """
+        return random.uniform(
+            0, min(self._backoff_cap, self._backoff_base * 2 ** attempt)
+        )
+
+    async def backoff(self, attempt: int):
+        """
+        Подождать перед повтором запроса
+        :param attempt: номер повтора, начиная с 0
+        """
+        self.retries += 1
+        await asyncio.sleep(self.backoff_delay(attempt))
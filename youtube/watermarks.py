@@ -0,0 +1,71 @@
+"""
+Хранилище отметок о том, до какого комментария уже скачано каждое видео.
+Нужно для инкрементальной загрузки: при повторном запуске скачиваются только новые комментарии
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class Watermark:
+    comment: str  # Идентификатор самого нового скачанного комментария верхнего уровня
+    published: str  # Время публикации самого нового скачанного комментария (ISO 8601, как отдаёт API)
+
+
+class WatermarkStore:
+    def __init__(self, path: str):
+        """
+        Хранилище отметок в SQLite
+        :param path: путь к файлу базы
+        """
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks (video TEXT PRIMARY KEY, comment TEXT, published TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS threads (id TEXT PRIMARY KEY, video TEXT, replies INTEGER)"
+        )
+        self._db.commit()
+
+    def get(self, video: str) -> Optional[Watermark]:
+        """
+        Отметка для видео
+        :param video: идентификатор видео
+        :return: отметка или None, если видео ещё не скачивалось
+        """
+        row = self._db.execute(
+            "SELECT comment, published FROM watermarks WHERE video = ?", (video,)
+        ).fetchone()
+        return Watermark(*row) if row else None
+
+    def reply_count(self, thread: str) -> Optional[int]:
+        """
+        Сколько ответов было у ветки комментариев при прошлой загрузке
+        :param thread: идентификатор комментария верхнего уровня
+        :return: количество ответов или None, если ветка ещё не встречалась
+        """
+        row = self._db.execute(
+            "SELECT replies FROM threads WHERE id = ?", (thread,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def update(self, video: str, mark: Watermark, reply_counts: Dict[str, int]):
+        """
+        Сохранить результат полной загрузки видео
+        :param video: идентификатор видео
+        :param mark: новая отметка
+        :param reply_counts: количество ответов по веткам комментариев
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+            (video, mark.comment, mark.published),
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO threads VALUES (?, ?, ?)",
+            [(thread, video, count) for thread, count in reply_counts.items()],
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
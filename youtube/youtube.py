@@ -2,16 +2,100 @@
 Этот модуль использует YouTube API чтобы вытаскивать комментарии под видео, а также искать видео в каналах
 """
 import asyncio
-import re
+import logging
 from asyncio import get_event_loop
 from dataclasses import dataclass
 from datetime import datetime
-from typing import AsyncGenerator, Dict, Iterable, List, Optional
+from time import monotonic
+from typing import (AbstractSet, AsyncGenerator, Callable, Dict, Iterable,
+                    List, Optional, Tuple, Union)
 
-from aiohttp import ClientSession
+from aiohttp import ClientConnectionError, ClientPayloadError, ClientSession
 
 from settings import Settings
 
+from .budget import CommentBudget
+from .cache import ResponseCache
+from .keys import KeyPool
+from .quota import QUOTA_COSTS, QuotaExhausted, QuotaScheduler
+from .telemetry import Telemetry
+from .throttle import AdaptiveLimiter
+from .watermarks import Watermark, WatermarkStore
+
+API_URL = "https://www.googleapis.com/youtube/v3/"
+
+# Сколько идентификаторов можно передать в одном запросе channels.list / videos.list
+MAX_IDS_PER_REQUEST = 50
+
+# Сколько секунд get_channels_info помнит информацию о канале
+CHANNEL_INFO_TTL = 24 * 3600
+
+# maxResults запросов комментариев, если бюджет комментариев не требует страниц поменьше
+COMMENTS_PAGE_SIZE = 500
+
+# Поля ответов (параметр fields, partial response), которые читает YouTubeApi: остальное API не присылает, и
+# ответы меньше и быстрее разбираются
+_VIDEOS_FIELDS = "items(kind,id,snippet(channelId))"
+_CHANNELS_INFO_FIELDS = "items(id,snippet(title,publishedAt),statistics(videoCount,viewCount,subscriberCount))"
+_UPLOADS_FIELDS = "items(id,contentDetails(relatedPlaylists(uploads)))"
+_SEARCH_FIELDS = "nextPageToken,items(id(kind,videoId))"
+_PLAYLIST_ITEMS_FIELDS = "nextPageToken,items(contentDetails(videoId,videoPublishedAt))"
+# Поля комментария, которые читает __to_comment (текст не запрашивается, если YouTubeApi создан без текстов)
+_COMMENT_SNIPPET_FIELDS = (
+    "authorChannelId",
+    "textOriginal",
+    "publishedAt",
+    "updatedAt",
+)
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    """
+    Разбить список на части не больше size элементов
+    """
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+# Причины ошибок API, после которых запрос имеет смысл повторить
+_TRANSIENT_REASONS = {
+    "rateLimitExceeded",
+    "userRateLimitExceeded",
+    "backendError",
+    "internalError",
+}
+# Причины ошибок, которые означают, что запросов слишком много
+_THROTTLING_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# Причины ошибок, которые означают, что ключ не работает
+_KEY_ERROR_REASONS = {
+    "keyInvalid",
+    "keyExpired",
+    "accessNotConfigured",
+    "ipRefererBlocked",
+}
+
+
+def _page_size(left: Optional[int]) -> int:
+    """
+    maxResults для страницы комментариев
+    :param left: сколько комментариев ещё можно скачать (None - без ограничения)
+    """
+    return COMMENTS_PAGE_SIZE if left is None else max(min(left, COMMENTS_PAGE_SIZE), 1)
+
+
+def _parse_date(value: str) -> datetime:
+    """
+    Разобрать дату из ответа API ("2020-12-01T10:00:00Z" или "2020-12-01T10:00:00.123Z").
+    Вызывается для каждого комментария, поэтому без strptime, который в несколько раз медленнее
+    """
+    return datetime(
+        int(value[0:4]),
+        int(value[5:7]),
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+    )
+
 
 @dataclass
 class ChannelVideo:
@@ -26,6 +110,8 @@ class Comment:
     author: str
     comment: str
     id: str
+    published: Optional[datetime] = None  # Время публикации (UTC)
+    updated: Optional[datetime] = None  # Время последнего изменения (UTC)
 
 
 @dataclass
@@ -38,33 +124,17 @@ class ChannelInfo:
     view_count: int  # Количество просмотров
 
 
-class _SessionWrap(ClientSession):
-    """
-    Этот класс может пригодиться для отладки расходов по квотам API.
-    Он считает количество обращений по ссылке и собирает статистику.
-    """
-
-    def __init__(self, *args, **kwargs):
-        self._calls = {}
-        super(_SessionWrap, self).__init__(*args, **kwargs)
-
-    def get(self, link, *args, **kwargs):
-        if link not in self._calls:
-            self._calls[link] = 0
-        self._calls[link] += 1
-        return super(_SessionWrap, self).get(link, *args, **kwargs)
-
-    @property
-    def stat(self):
-        return self._calls
-
-
 class YouTubeError(Exception):
-    def __init__(self, code: int, message: str):
+    def __init__(self, code: int, message: str, reason: str = ""):
         self._code = code
         self._message = message
+        self._reason = reason
         super(YouTubeError, self).__init__(message + " (error code " + str(code) + ")")
 
+    @property
+    def reason(self):
+        return self._reason
+
     @property
     def message(self):
         return self._message
@@ -74,63 +144,255 @@ class YouTubeError(Exception):
         return self._code
 
 
+# Фильтр авторов комментариев: множество идентификаторов или функция идентификатор -> подходит ли автор
+AuthorFilter = Union[AbstractSet[str], Callable[[str], bool]]
+
+
 class YouTubeApi:
-    def __init__(self, key: str, session: ClientSession):
+    def __init__(
+        self,
+        key: Union[str, KeyPool],
+        session: ClientSession,
+        cache: Optional[ResponseCache] = None,
+        watermarks: Optional[WatermarkStore] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        reply_parallel: int = 10,
+        api_url: str = API_URL,
+        with_text: bool = True,
+    ):
         """
         YouTube API класс
-        :param key: API ключ
+        :param key: API ключ или набор ключей
         :param session: aiohttp session object
+        :param cache: кэш ответов API (если не указан, каждый запрос идёт в сеть)
+        :param watermarks: хранилище отметок для инкрементальной загрузки комментариев (если не указано,
+                           комментарии под видео каждый раз скачиваются целиком)
+        :param scheduler: планировщик запросов с учётом квоты (если не указан, запросы идут без ограничений)
+        :param limiter: адаптивное ограничение одновременных запросов с повтором после временных ошибок (если не
+                        указано, запросы не ограничиваются и не повторяются)
+        :param reply_parallel: сколько веток ответов под одним видео можно загружать одновременно
+        :param api_url: адрес API (например, локальной замены API для тестов производительности, см. benchmark)
+        :param with_text: скачивать тексты комментариев. Без них (если нужна только статистика) ответы API
+                          заметно меньше, а поле comment у комментариев - пустая строка
         """
         self._session = session
-        self._key = key
+        self._keys = key if isinstance(key, KeyPool) else KeyPool([key])
+        self._cache = cache
+        self._watermarks = watermarks
+        self._scheduler = scheduler
+        self._limiter = limiter
+        # Канал -> (информация, когда получена), см. get_channels_info
+        self._channels_info: Dict[str, Tuple[ChannelInfo, float]] = {}
+        self._reply_parallel = reply_parallel
+        self._api_url = api_url
+        snippet = ",".join(
+            field
+            for field in _COMMENT_SNIPPET_FIELDS
+            if with_text or field != "textOriginal"
+        )
+        comment = "kind,id,snippet(" + snippet + ")"
+        self._comments_fields = "nextPageToken,items(" + comment + ")"
+        self._threads_fields = (
+            "nextPageToken,items(kind,id,snippet(totalReplyCount,topLevelComment(snippet("
+            + snippet
+            + "))),replies(comments("
+            + comment
+            + ")))"
+        )
+        # Сколько комментариев отброшено фильтром авторов (см. list_comments)
+        self.skipped_comments = 0
 
-    async def _api_get(self, link: str, params: Optional[Dict] = None) -> Dict:
+    async def _api_get(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        subject: Optional[Dict[str, str]] = None,
+    ) -> Dict:
         """
         Отправить get-запрос и проверить JSON на ошибки
-        :param link: ссылка
+        :param endpoint: метод API (например, "videos")
+        :param params: параметры запроса (без API ключа)
+        :param subject: к какому каналу и видео относится запрос ({"channel": ..., "video": ...}), для телеметрии
         :return: json словарь
         """
-        async with self._session.get(link, params=params) as resp:
-            data = await resp.json()
-        if "error" in data:
-            raise YouTubeError(data["error"]["code"], data["error"]["message"])
+        if self._cache:
+            data = self._cache.get(endpoint, params)
+            if data is not None:
+                return data
 
+        attempt = 0
+        while True:
+            try:
+                if self._scheduler:
+                    async with self._scheduler.slot(endpoint):
+                        data = await self._limited_request(endpoint, params, subject)
+                else:
+                    data = await self._limited_request(endpoint, params, subject)
+                break
+            except (
+                YouTubeError,
+                ClientConnectionError,
+                ClientPayloadError,
+                asyncio.TimeoutError,
+            ) as err:
+                if (
+                    not self._limiter
+                    or not self._is_transient(err)
+                    or attempt >= self._limiter.max_retries
+                ):
+                    raise
+                logging.debug("Retry " + endpoint + " after error: " + str(err))
+                await self._limiter.backoff(attempt)
+                attempt += 1
+
+        if self._cache:
+            self._cache.put(endpoint, params, data)
         return data
 
-    async def list_videos_by_ids(self, ids: Iterable[str]) -> List[ChannelVideo]:
+    @classmethod
+    def _is_transient(cls, err: Exception) -> bool:
         """
-        Получить идентификатор канала для каждого видео из списка
-        :param ids: идентификаторы видео
-        :return: Список видео (с идентификаторами каналов)
+        Временная ошибка: перегрузка сервера, ограничение частоты запросов или обрыв соединения
         """
-        link = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "key": self._key,
-            "part": "snippet",
-            "maxResults": 500,
-            "id": ",".join(ids),
-        }
+        if isinstance(err, YouTubeError):
+            return (
+                err.reason in _TRANSIENT_REASONS or err.code == 429 or err.code >= 500
+            )
+        return True
 
-        videos = []
+    @classmethod
+    def _is_throttling(cls, err: Exception) -> bool:
+        """
+        API просит снизить частоту запросов
+        """
+        return isinstance(err, YouTubeError) and (
+            err.reason in _THROTTLING_REASONS or err.code in (429, 503)
+        )
+
+    async def _limited_request(
+        self, endpoint: str, params: Optional[Dict], subject: Optional[Dict[str, str]]
+    ) -> Dict:
+        """
+        Выполнить запрос в пределах адаптивного лимита одновременных запросов
+        """
+        if not self._limiter:
+            return await self._request(endpoint, params, subject)
+
+        epoch = await self._limiter.acquire()
+        throttled = False
+        try:
+            return await self._request(endpoint, params, subject)
+        except YouTubeError as err:
+            throttled = self._is_throttling(err)
+            raise
+        finally:
+            self._limiter.release(epoch, throttled)
+
+    async def _request(
+        self,
+        endpoint: str,
+        params: Optional[Dict],
+        subject: Optional[Dict[str, str]] = None,
+    ) -> Dict:
+        """
+        Выполнить запрос к API. Если у ключа кончилась квота или ключ не работает, запрос повторяется со
+        следующим ключом из набора
+        :param endpoint: метод API
+        :param params: параметры запроса (без API ключа)
+        :param subject: канал и видео запроса (передаются в телеметрию через trace_request_ctx)
+        :return: json словарь
+        """
         while True:
+            try:
+                key = self._keys.acquire(QUOTA_COSTS.get(endpoint, 1))
+            except QuotaExhausted:
+                if self._scheduler:
+                    self._scheduler.exhaust()
+                raise
 
-            data = await self._api_get(link, params)
+            async with self._session.get(
+                self._api_url + endpoint,
+                params={"key": key, **(params or {})},
+                trace_request_ctx=subject,
+            ) as resp:
+                # Сервер может вернуть не JSON, а страницу с ошибкой
+                if resp.status >= 500:
+                    raise YouTubeError(resp.status, str(resp.reason))
+                data = await resp.json()
+            if "error" not in data:
+                self._keys.succeeded(key)
+                return data
+
+            error = data["error"]
+            reason = error.get("errors", [{}])[0].get("reason", "")
+            if reason == "quotaExceeded":
+                logging.warning("API key ..." + key[-4:] + " is out of quota")
+                self._keys.exhaust(key)
+                continue
+            if reason in _KEY_ERROR_REASONS:
+                logging.warning("API key ..." + key[-4:] + " does not work: " + reason)
+                self._keys.disable(key)
+                continue
+            if reason in _THROTTLING_REASONS:
+                self._keys.failed(key)
+            raise YouTubeError(error["code"], error["message"], reason)
 
-            videos += [
+    async def list_videos_by_ids(
+        self,
+        ids: Iterable[str],
+        known: Optional[Iterable[ChannelVideo]] = None,
+        parallel: int = 10,
+    ) -> List[ChannelVideo]:
+        """
+        Получить идентификатор канала для каждого видео из списка.
+        Видео запрашиваются пачками по MAX_IDS_PER_REQUEST, не больше parallel пачек одновременно
+        :param ids: идентификаторы видео
+        :param known: уже найденные видео (например, на каналах), их не нужно запрашивать повторно
+        :param parallel: сколько запросов можно выполнять одновременно
+        :return: Список видео (с идентификаторами каналов), кроме уже найденных
+        """
+        known_codes = {video.code for video in known or []}
+        # dict.fromkeys убирает повторы и сохраняет порядок
+        ids = [code for code in dict.fromkeys(ids) if code not in known_codes]
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def fetch(chunk: List[str]) -> List[ChannelVideo]:
+            params = {
+                "part": "snippet",
+                "maxResults": MAX_IDS_PER_REQUEST,
+                "id": ",".join(chunk),
+                "fields": _VIDEOS_FIELDS,
+            }
+            async with semaphore:
+                data = await self._api_get("videos", params)
+            return [
                 ChannelVideo(video["snippet"]["channelId"], video["id"])
                 for video in data["items"]
                 if "video" in video["kind"]
             ]
 
-            # Видео много, нужно скачать их со следующей страницы
-            if "nextPageToken" in data:
-                params["pageToken"] = data["nextPageToken"]
-                continue
-            else:
-                break
-
+        videos = []
+        for chunk_videos in await asyncio.gather(
+            *[fetch(chunk) for chunk in _chunks(ids, MAX_IDS_PER_REQUEST)]
+        ):
+            videos += chunk_videos
         return videos
 
+    @classmethod
+    def __to_channel_info(cls, item: Dict) -> ChannelInfo:
+        """
+        Конвертировать JSON объект канала в информацию о канале
+        """
+        return ChannelInfo(
+            channel=item["id"],
+            registration_date=_parse_date(item["snippet"]["publishedAt"]),
+            video_count=int(item["statistics"]["videoCount"]),
+            title=item["snippet"]["title"],
+            subscribers_count=int(item["statistics"].get("subscriberCount", -1)),
+            view_count=int(item["statistics"]["viewCount"]),
+        )
+
     async def get_channel_info(self, channel: str) -> Optional[ChannelInfo]:
         """
         Получить информацию по каналу
@@ -138,30 +400,86 @@ class YouTubeApi:
         :return: информация
         """
 
-        link = "https://www.googleapis.com/youtube/v3/channels"
-        params = {"key": self._key, "id": channel, "part": "snippet,statistics"}
+        params = {
+            "id": channel,
+            "part": "snippet,statistics",
+            "fields": _CHANNELS_INFO_FIELDS,
+        }
 
-        data = await self._api_get(link, params)
+        data = await self._api_get("channels", params)
 
         if "items" not in data:
             return None  # Нет такого канала
 
-        item = data["items"][0]
+        return self.__to_channel_info(data["items"][0])
 
-        date_str = re.match(
-            "\d\d\d\d-\d\d-\d\dT\d\d:\d\d:\d\d", item["snippet"]["publishedAt"]
-        )[0]
-        date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S")
+    async def get_channels_info(
+        self, channels: Iterable[str], parallel: int = 10
+    ) -> Dict[str, ChannelInfo]:
+        """
+        Получить информацию по многим каналам сразу (например, по авторам комментариев).
+        Каналы запрашиваются пачками по MAX_IDS_PER_REQUEST, не больше parallel пачек одновременно.
+        Результаты запоминаются на CHANNEL_INFO_TTL секунд, а если у YouTubeApi есть кэш ответов - то и в нём,
+        так же, как для get_channel_info
+        :param channels: идентификаторы каналов
+        :param parallel: сколько запросов можно выполнять одновременно
+        :return: Словарь канал -> информация (несуществующих каналов в нём нет)
+        """
+        now = monotonic()
+        result = {}
+        missing = []
+        for channel in dict.fromkeys(channels):
+            if channel in self._channels_info:
+                info, fetched = self._channels_info[channel]
+                if now - fetched < CHANNEL_INFO_TTL:
+                    result[channel] = info
+                    continue
+            if self._cache:
+                data = self._cache.get(
+                    "channels",
+                    {
+                        "id": channel,
+                        "part": "snippet,statistics",
+                        "fields": _CHANNELS_INFO_FIELDS,
+                    },
+                )
+                if data is not None:
+                    if "items" in data:
+                        result[channel] = self.__to_channel_info(data["items"][0])
+                        self._channels_info[channel] = (result[channel], now)
+                    continue
+            missing.append(channel)
+
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def fetch(chunk: List[str]):
+            params = {
+                "id": ",".join(chunk),
+                "part": "snippet,statistics",
+                "maxResults": MAX_IDS_PER_REQUEST,
+                "fields": _CHANNELS_INFO_FIELDS,
+            }
+            async with semaphore:
+                data = await self._api_get("channels", params)
+            for item in data.get("items", []):
+                info = self.__to_channel_info(item)
+                result[info.channel] = info
+                self._channels_info[info.channel] = (info, monotonic())
+                if self._cache:
+                    self._cache.put(
+                        "channels",
+                        {
+                            "id": info.channel,
+                            "part": "snippet,statistics",
+                            "fields": _CHANNELS_INFO_FIELDS,
+                        },
+                        {"items": [item]},
+                    )
 
-        info = ChannelInfo(
-            channel=channel,
-            registration_date=date,
-            video_count=int(item["statistics"]["videoCount"]),
-            title=item["snippet"]["title"],
-            subscribers_count=int(item["statistics"].get("subscriberCount", -1)),
-            view_count=int(item["statistics"]["viewCount"]),
+        await asyncio.gather(
+            *[fetch(chunk) for chunk in _chunks(missing, MAX_IDS_PER_REQUEST)]
         )
-        return info
+        return result
 
     async def list_videos_by_channel(
         self,
@@ -174,8 +492,7 @@ class YouTubeApi:
         :param date_clamp: дата, начиная с которой смотреть видео
         :return: Список видео
         """
-        link = "https://www.googleapis.com/youtube/v3/search"
-        params = {"key": self._key, "maxResults": 500, "channelId": channel}
+        params = {"maxResults": 500, "channelId": channel, "fields": _SEARCH_FIELDS}
 
         if date_clamp:
             params["publishedAfter"] = date_clamp.isoformat() + "Z"
@@ -183,7 +500,7 @@ class YouTubeApi:
         videos = []
         while True:
 
-            data = await self._api_get(link, params)
+            data = await self._api_get("search", params, {"channel": channel})
 
             videos += [
                 ChannelVideo(channel, video["id"]["videoId"])
@@ -199,6 +516,99 @@ class YouTubeApi:
 
         return videos
 
+    async def list_uploads_playlists(self, channels: Iterable[str]) -> Dict[str, str]:
+        """
+        Найти плейлисты загрузок (в них лежат все видео канала) для списка каналов.
+        Каналы запрашиваются пачками по MAX_IDS_PER_REQUEST, одна пачка стоит одну единицу квоты
+        :param channels: идентификаторы каналов
+        :return: Словарь канал -> идентификатор плейлиста загрузок
+        """
+
+        async def fetch(chunk: List[str]) -> Dict[str, str]:
+            params = {
+                "part": "contentDetails",
+                "maxResults": MAX_IDS_PER_REQUEST,
+                "id": ",".join(chunk),
+                "fields": _UPLOADS_FIELDS,
+            }
+            data = await self._api_get("channels", params)
+            return {
+                item["id"]: item["contentDetails"]["relatedPlaylists"]["uploads"]
+                for item in data.get("items", [])
+            }
+
+        playlists = {}
+        for result in await asyncio.gather(
+            *[fetch(chunk) for chunk in _chunks(list(channels), MAX_IDS_PER_REQUEST)]
+        ):
+            playlists.update(result)
+        return playlists
+
+    async def list_videos_by_uploads(
+        self,
+        channel: str,
+        playlist: str,
+        date_clamp: Optional[datetime] = None,
+    ) -> List[ChannelVideo]:
+        """
+        Получить видео канала из его плейлиста загрузок. В отличие от list_videos_by_channel, страница стоит одну
+        единицу квоты вместо ста. Плейлист отсортирован от новых видео к старым, поэтому загрузка останавливается
+        на первом видео старше date_clamp
+        :param channel: идентификатор канала
+        :param playlist: плейлист загрузок канала (см. list_uploads_playlists)
+        :param date_clamp: дата, начиная с которой смотреть видео
+        :return: Список видео
+        """
+        params = {
+            "part": "contentDetails",
+            "maxResults": MAX_IDS_PER_REQUEST,
+            "playlistId": playlist,
+            "fields": _PLAYLIST_ITEMS_FIELDS,
+        }
+
+        videos = []
+        while True:
+
+            data = await self._api_get("playlistItems", params, {"channel": channel})
+
+            outdated = False
+            for item in data["items"]:
+                details = item["contentDetails"]
+                # У удалённых и приватных видео нет даты публикации
+                if "videoPublishedAt" not in details:
+                    continue
+                if date_clamp and _parse_date(details["videoPublishedAt"]) < date_clamp:
+                    outdated = True
+                    break
+                videos.append(ChannelVideo(channel, details["videoId"]))
+
+            if "nextPageToken" in data and not outdated:
+                params["pageToken"] = data["nextPageToken"]
+                continue
+            else:
+                break
+
+        return videos
+
+    @classmethod
+    def __snippet(cls, data) -> Dict:
+        snippet = data["snippet"]
+        if "commentThread" in data["kind"]:
+            snippet = snippet["topLevelComment"]["snippet"]
+        return snippet
+
+    @classmethod
+    def __author(cls, data) -> str:
+        """
+        Автор JSON объекта комментария
+        """
+        snippet = cls.__snippet(data)
+        return (
+            snippet["authorChannelId"]["value"]
+            if "authorChannelId" in snippet
+            else "none"
+        )
+
     @classmethod
     def __to_comment(cls, data, channel: str, video: str) -> Comment:
         """
@@ -208,113 +618,306 @@ class YouTubeApi:
         :param video:
         :return:
         """
-        snippet = data["snippet"]
-        if "commentThread" in data["kind"]:
-            snippet = snippet["topLevelComment"]["snippet"]
-
+        snippet = cls.__snippet(data)
         return Comment(
             channel=channel,
             video=video,
-            author=snippet["authorChannelId"]["value"]
-            if "authorChannelId" in snippet
-            else "none",
-            comment=snippet["textOriginal"],
+            author=cls.__author(data),
+            comment=snippet.get("textOriginal", ""),
             id=data["id"],
+            published=_parse_date(snippet["publishedAt"]),
+            updated=(
+                _parse_date(snippet["updatedAt"]) if "updatedAt" in snippet else None
+            ),
         )
 
-    async def list_child_comments(
-        self, parent: str, channel: str, video: str
+    def __accepts(self, data, authors: Optional[Callable[[str], bool]]) -> bool:
+        """
+        Проходит ли JSON объект комментария фильтр авторов; отброшенные комментарии считаются в skipped_comments
+        """
+        if authors is None or authors(self.__author(data)):
+            return True
+        self.skipped_comments += 1
+        return False
+
+    async def _raw_child_comments(
+        self,
+        parent: str,
+        subject: Optional[Dict[str, str]] = None,
+        limit: Optional[int] = None,
     ) -> AsyncGenerator:
         """
-        Скачать список дочерних комментариев (reply ответов на комментарий)
+        Скачать JSON объекты дочерних комментариев (reply ответов на комментарий)
         :param parent: родительский комментарий
-        :param channel: ссылка на канал (для заполнения свойства channel)
-        :param video: ссылка на видео (для заполнения свойства video)
-        :return: Генератор комментариев
+        :param subject: канал и видео (для телеметрии)
+        :param limit: скачать не больше стольких ответов
+        :return: Генератор JSON объектов
         """
-        link = "https://www.googleapis.com/youtube/v3/comments"
         params = {
-            "key": self._key,
-            "maxResults": 500,
+            "maxResults": _page_size(limit),
             "parentId": parent,
             "part": "snippet,id",
+            "fields": self._comments_fields,
         }
+        count = 0
 
         while True:
 
-            data = await self._api_get(link, params)
+            data = await self._api_get("comments", params, subject)
 
             for raw_comment in data["items"]:
-                yield self.__to_comment(raw_comment, channel, video)
+                yield raw_comment
+                count += 1
+                if limit is not None and count >= limit:
+                    return
 
             if "nextPageToken" in data:
+                if limit is not None:
+                    params["maxResults"] = _page_size(limit - count)
                 params["pageToken"] = data["nextPageToken"]
                 continue
             else:
                 break
 
-    async def list_comments(self, video: str, channel: str) -> AsyncGenerator:
+    async def list_child_comments(
+        self, parent: str, channel: str, video: str
+    ) -> AsyncGenerator:
+        """
+        Скачать список дочерних комментариев (reply ответов на комментарий)
+        :param parent: родительский комментарий
+        :param channel: ссылка на канал (для заполнения свойства channel)
+        :param video: ссылка на видео (для заполнения свойства video)
+        :return: Генератор комментариев
+        """
+        subject = {"channel": channel, "video": video}
+        async for raw_comment in self._raw_child_comments(parent, subject):
+            yield self.__to_comment(raw_comment, channel, video)
+
+    async def _fetch_replies(
+        self,
+        parent: str,
+        semaphore: asyncio.Semaphore,
+        subject: Optional[Dict[str, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List:
         """
-        Скачать список комментариев под видео
+        Скачать все JSON объекты ответов на комментарий, не больше, чем позволяет semaphore, одновременно
+        :param parent: родительский комментарий
+        :param semaphore: ограничение на число одновременно загружаемых веток
+        :param subject: канал и видео (для телеметрии)
+        :param limit: скачать не больше стольких ответов
+        :return: список JSON объектов
+        """
+        async with semaphore:
+            return [
+                raw_comment
+                async for raw_comment in self._raw_child_comments(
+                    parent, subject, limit
+                )
+            ]
+
+    async def list_comments(
+        self,
+        video: str,
+        channel: str,
+        authors: Optional[AuthorFilter] = None,
+        budget: Optional[CommentBudget] = None,
+        since: Optional[datetime] = None,
+    ) -> AsyncGenerator:
+        """
+        Скачать список комментариев под видео.
+        Ответы, которые не пришли вместе с веткой, качаются параллельно (не больше reply_parallel веток сразу),
+        а следующая страница веток качается, пока разбирается текущая.
+        Если YouTubeApi создан с хранилищем отметок, скачиваются только комментарии, появившиеся после прошлой
+        полной загрузки видео. Ответы на старые ветки ищутся только на последней просмотренной странице, и только
+        в ветках, где изменилось количество ответов
         :param video: идентификатор видео
         :param channel: идентификатор канал (для заполнения поля channel)
-        :param page_id: идентификатор следующей страницы (для многостраничной загрузки в рекурсии)
+        :param authors: отдавать только комментарии этих авторов. Остальные комментарии не превращаются в Comment,
+                        а только считаются в skipped_comments. Отметки для инкрементальной загрузки сдвигаются и по
+                        отброшенным комментариям, поэтому при смене фильтра отметки нужно сбросить
+        :param budget: ограничение на число скачанных комментариев (в нём учитываются и отброшенные фильтром
+                       авторов). Размер страниц подбирается под оставшийся бюджет, а ответы, на которые его уже не
+                       хватает, не загружаются. Если бюджета не хватило на всё видео, отметка не сдвигается
+        :param since: скачать только ветки, начатые не раньше этого момента (UTC). Ветки запрашиваются от новых к
+                      старым, и страницы перестают качаться на первой более старой ветке. Новые ответы в старых
+                      ветках при этом не скачиваются
         :return: генератор комментариев
         """
-        link = "https://www.googleapis.com/youtube/v3/commentThreads"
+        if authors is not None and not callable(authors):
+            authors = authors.__contains__
+
+        def left() -> Optional[int]:
+            return budget.remaining(channel, video) if budget else None
+
+        if left() == 0:
+            return
+
         params = {
-            "key": self._key,
-            "maxResults": 500,
+            "maxResults": _page_size(left()),
             "videoId": video,
             "textFormat": "plainText",
             "part": "snippet, id, replies",
+            "fields": self._threads_fields,
         }
 
-        while True:
-            try:
-                data = await self._api_get(link, params)
-            except YouTubeError as err:
-                # Комментарии отключены
-                if "disabled comments" in err.message:
-                    return
-                raise
-
-            for raw_comment in data["items"]:
-                yield self.__to_comment(raw_comment, channel, video)
-                replies = raw_comment["snippet"]["totalReplyCount"]
-                if replies:  # У комментария есть дочерние комментарии
-                    if (
-                        len(raw_comment["replies"]["comments"]) == replies
-                    ):  # Записать дочерние комментарии
-                        for raw_child_comment in raw_comment["replies"]["comments"]:
+        mark = None
+        reply_counts = {}
+        if self._watermarks:
+            # Новые комментарии идут первыми, поэтому можно остановиться на уже скачанных
+            params["order"] = "time"
+            mark = self._watermarks.get(video)
+        # Даты в ответах API сравниваются как строки, без разбора каждой
+        cutoff = None
+        if since is not None:
+            params["order"] = "time"
+            cutoff = since.strftime("%Y-%m-%dT%H:%M:%S")
+        # Отметка - самая новая ветка и самое позднее время публикации среди всех скачанных комментариев
+        newest = Watermark("", mark.published if mark else "")
+        reached = False
+        # Бюджет не позволил скачать видео целиком
+        capped = False
+
+        subject = {"channel": channel, "video": video}
+        semaphore = asyncio.Semaphore(self._reply_parallel)
+        next_page = asyncio.ensure_future(
+            self._api_get("commentThreads", dict(params), subject)
+        )
+        # Незавершённые задачи, которые нужно отменить, если генератор закроют раньше времени. Завершённые задачи
+        # сразу убираются, чтобы не держать в памяти уже разобранные страницы
+        pending = {next_page}
+        next_page.add_done_callback(pending.discard)
+        try:
+            while next_page:
+                try:
+                    data = await next_page
+                except YouTubeError as err:
+                    # Комментарии отключены
+                    if "disabled comments" in err.message:
+                        return
+                    raise
+                next_page = None
+
+                # Сколько комментариев останется в бюджете после этой страницы (None - без ограничения)
+                planned = left()
+                # (JSON объект ветки, время публикации, ветка уже скачана раньше, нужно разобрать ответы)
+                threads = []
+                # Ветки, в которых ответов так много, что их нужно загружать отдельно, и сколько ответов загружать
+                fetch = []
+                for raw_comment in data["items"]:
+                    snippet = raw_comment["snippet"]
+                    published = snippet["topLevelComment"]["snippet"]["publishedAt"]
+                    if cutoff is not None and published[:19] < cutoff:
+                        # Дальше только более старые ветки
+                        reached = True
+                        break
+                    replies = snippet["totalReplyCount"]
+                    reply_counts[raw_comment["id"]] = replies
+                    # Эта ветка уже скачана раньше, из неё нужны только новые ответы
+                    old = mark is not None and (
+                        raw_comment["id"] == mark.comment or published <= mark.published
+                    )
+                    expand = bool(replies) and (
+                        not old
+                        or replies != self._watermarks.reply_count(raw_comment["id"])
+                    )
+                    reached = reached or old
+                    threads.append((raw_comment, published, old, expand))
+
+                    if planned is not None:
+                        planned = max(planned - 1, 0)
+                    if not expand:
+                        continue
+                    inline = len(raw_comment["replies"]["comments"])
+                    if inline != replies and (planned is None or planned > inline):
+                        fetch.append((raw_comment["id"], planned))
+                        inline = replies
+                    elif inline != replies:
+                        # Бюджет почти исчерпан: хватит ответов, пришедших вместе с веткой
+                        capped = True
+                    if planned is not None:
+                        capped = capped or planned < inline
+                        planned -= min(planned, inline)
+
+                if "nextPageToken" in data and not reached:
+                    if planned == 0:
+                        capped = True
+                    else:  # Комментариев много, следующая страница качается, пока разбирается эта
+                        params["pageToken"] = data["nextPageToken"]
+                        params["maxResults"] = _page_size(planned)
+                        next_page = asyncio.ensure_future(
+                            self._api_get("commentThreads", dict(params), subject)
+                        )
+                        pending.add(next_page)
+                        next_page.add_done_callback(pending.discard)
+
+                replies_tasks = {}
+                for parent, limit in fetch:
+                    task = asyncio.ensure_future(
+                        self._fetch_replies(parent, semaphore, subject, limit)
+                    )
+                    replies_tasks[parent] = task
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+                for raw_comment, published, old, expand in threads:
+                    if not old:
+                        if budget and not budget.take(channel, video):
+                            return
+                        if published > newest.published:
+                            newest = Watermark(raw_comment["id"], published)
+                        if self.__accepts(raw_comment, authors):
+                            yield self.__to_comment(raw_comment, channel, video)
+                    if not expand:
+                        continue
+
+                    if raw_comment["id"] in replies_tasks:
+                        raw_children = await replies_tasks.pop(raw_comment["id"])
+                    else:  # Ответы, пришедшие вместе с веткой
+                        raw_children = raw_comment["replies"]["comments"]
+                    for raw_child_comment in raw_children:
+                        child_published = raw_child_comment["snippet"]["publishedAt"]
+                        if old and child_published <= mark.published:
+                            continue
+                        if budget and not budget.take(channel, video):
+                            return
+                        newest.published = max(newest.published, child_published)
+                        if self.__accepts(raw_child_comment, authors):
                             yield self.__to_comment(raw_child_comment, channel, video)
-                    # TODO: Здесь возможна оптимизация, тянуть дочерние комментарии через gather
-                    else:  # Дочерних комментариев так много, что нужно отдельно загрузить их
-                        async for child in self.list_child_comments(
-                            raw_comment["id"], channel, video
-                        ):
-                            yield child
-            if (
-                "nextPageToken" in data
-            ):  # Комментариев много, нужно скачать их со следующей страницы
-                params["pageToken"] = data["nextPageToken"]
-                continue
-            else:
-                break
+        finally:
+            for task in list(pending):
+                task.cancel()
+
+        if self._watermarks and not capped:
+            if not newest.comment and mark:  # Новых веток нет
+                newest.comment = mark.comment
+            self._watermarks.update(video, newest, reply_counts)
 
     async def list_comments_full_list(
-        self, video: str, channel: str, limit: Optional[int] = None
+        self,
+        video: str,
+        channel: str,
+        limit: Optional[int] = None,
+        authors: Optional[AuthorFilter] = None,
     ) -> List[Comment]:
         """
-        То же, что и list_comments, но стащить сразу весь лист, без генераторов
+        То же, что и list_comments, но стащить сразу весь лист, без генераторов.
+        Если квота закончилась, вернуть то, что успели скачать
+        :param limit: скачать не больше стольких комментариев
         """
         comments = []
-        count = 0
-        async for comment in self.list_comments(video, channel):
-            comments.append(comment)
-            count += 1
-            if limit and count > limit:
-                break
+        budget = CommentBudget(per_video=limit) if limit else None
+        try:
+            async for comment in self.list_comments(video, channel, authors, budget):
+                comments.append(comment)
+        except QuotaExhausted:
+            logging.warning(
+                "Quota exhausted, video "
+                + video
+                + " has only "
+                + str(len(comments))
+                + " comments fetched"
+            )
         return comments
 
 
@@ -326,7 +929,8 @@ async def process_video(channel: str, video: str, api: YouTubeApi):
 
 
 async def main():
-    async with _SessionWrap() as session:
+    telemetry = Telemetry()
+    async with ClientSession(trace_configs=[telemetry.trace_config()]) as session:
         api = YouTubeApi(Settings.api_key(), session)
         channel = "UCWjEiMNZv4g3P9BWbrtMjyA"
         videos = await api.list_videos_by_channel(channel)
@@ -336,7 +940,7 @@ async def main():
             *[process_video(channel, video.code, api) for video in videos]
         )
 
-        print(session.stat)
+        print(telemetry.summary())
 
 
 if __name__ == "__main__":